@@ -0,0 +1,40 @@
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def get_token_cache_key(key):
+    return f'auth:token:{sha256(key.encode()).hexdigest()}'
+
+
+def invalidate_token(key):
+    cache.delete(get_token_cache_key(key))
+
+
+def invalidate_user_tokens(user):
+    cache.delete_many([
+        get_token_cache_key(key)
+        for key in Token.objects.filter(user=user).values_list(
+            'key', flat=True)
+    ])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кешированием пользователя по токену.
+
+    Запись в кеше живёт TOKEN_CACHE_TIMEOUT секунд и удаляется при
+    выходе, смене пароля, деактивации и любом другом сохранении
+    пользователя (см. users.signals).
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        user = cache.get(cache_key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, user, settings.TOKEN_CACHE_TIMEOUT)
+            return user, token
+        return user, Token(key=key, user=user)
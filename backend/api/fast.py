@@ -0,0 +1,89 @@
+from collections import defaultdict
+
+from recipes.images import get_variant_urls
+from recipes.models import IngredientInRecipe, Recipe
+from users.models import Subscribe
+
+from .metrics import measure_serialization
+
+RECIPE_FIELDS = (
+    'id',
+    'pub_date',
+    'name',
+    'image',
+    'image_variants_ready',
+    'text',
+    'cooking_time',
+    'author_id',
+    'author__email',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+)
+FLAG_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def get_recipe_rows(queryset, user):
+    """Плоские строки рецептов для serialize_recipes."""
+    if user.is_authenticated:
+        return queryset.values(*RECIPE_FIELDS, *FLAG_FIELDS)
+    return queryset.values(*RECIPE_FIELDS)
+
+
+def serialize_recipes(rows, request):
+    """Те же данные, что RecipeReadSerializer(many=True), из строк values().
+
+    Теги, ингредиенты и подписки выбираются тремя запросами на страницу
+    в том же порядке, что и prefetch_related основного пути.
+    """
+    with measure_serialization():
+        ids = [row['id'] for row in rows]
+        tags = defaultdict(list)
+        for recipe_id, *tag in Recipe.tags.through.objects.filter(
+                recipe_id__in=ids).order_by('tag__name').values_list(
+                'recipe_id', 'tag_id', 'tag__name', 'tag__color',
+                'tag__slug'):
+            tags[recipe_id].append(dict(zip(
+                ('id', 'name', 'color', 'slug'), tag)))
+        ingredients = defaultdict(list)
+        for recipe_id, *ingredient in IngredientInRecipe.objects.filter(
+                recipe_id__in=ids).values_list(
+                'recipe_id', 'ingredient_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount'):
+            ingredients[recipe_id].append(dict(zip(
+                ('id', 'name', 'measurement_unit', 'amount'), ingredient)))
+        user = request.user
+        subscriptions = set()
+        if user.is_authenticated and ids:
+            subscriptions = set(Subscribe.objects.filter(
+                user=user,
+                author_id__in={row['author_id'] for row in rows},
+            ).values_list('author_id', flat=True))
+        storage = Recipe._meta.get_field('image').storage
+        return [
+            {
+                'id': row['id'],
+                'tags': tags[row['id']],
+                'author': {
+                    'email': row['author__email'],
+                    'id': row['author_id'],
+                    'username': row['author__username'],
+                    'first_name': row['author__first_name'],
+                    'last_name': row['author__last_name'],
+                    'is_subscribed': row['author_id'] in subscriptions,
+                },
+                'ingredients': ingredients[row['id']],
+                'is_favorited': row.get('is_favorited', False),
+                'is_in_shopping_cart': row.get('is_in_shopping_cart', False),
+                'name': row['name'],
+                'image': request.build_absolute_uri(
+                    storage.url(row['image'])) if row['image'] else None,
+                'image_variants': {
+                    variant: request.build_absolute_uri(url)
+                    for variant, url in get_variant_urls(row['image']).items()
+                } if row['image_variants_ready'] else None,
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+            }
+            for row in rows
+        ]
@@ -0,0 +1,29 @@
+import hashlib
+import posixpath
+
+from django.core.files.storage import default_storage
+from drf_extra_fields.fields import Base64ImageField
+
+
+class HashedBase64ImageField(Base64ImageField):
+    """Base64-изображение, сохраняемое под хешем содержимого.
+
+    Повторная загрузка того же изображения не создаёт новый файл:
+    поле возвращает имя уже сохранённого.
+    """
+
+    def __init__(self, *args, upload_to='', **kwargs):
+        self.upload_to = upload_to
+        super().__init__(*args, **kwargs)
+
+    def get_file_name(self, decoded_file):
+        return hashlib.sha256(decoded_file).hexdigest()
+
+    def to_internal_value(self, base64_data):
+        file = super().to_internal_value(base64_data)
+        if file is None:
+            return None
+        name = posixpath.join(self.upload_to, file.name)
+        if default_storage.exists(name):
+            return name
+        return file
@@ -1,22 +1,37 @@
+from django.db.models import F
+from django.db.models.functions import Lower
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
+from recipes.utils import get_tag_bits
 from users.models import User
 
+# До этого числа тегов фильтр перечисляет подходящие маски через IN,
+# что позволяет использовать индекс по Recipe.tags_mask.
+TAG_MASK_IN_LIMIT = 8
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_bits()]
+
 
 class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='istartswith')
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ['name']
 
+    def filter_name(self, queryset, name, value):
+        return queryset.alias(name_lower=Lower('name')).filter(
+            name_lower__startswith=value.lower())
+
 
 class RecipeFilter(FilterSet):
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='filter_tags',
     )
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited'
@@ -24,19 +39,47 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(
+        method='filter_search'
+    )
 
     class Meta:
         model = Recipe
         fields = ['is_favorited', 'author', 'tags', 'is_in_shopping_cart']
 
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        bits = get_tag_bits()
+        mask = 0
+        for slug in value:
+            mask |= 1 << bits[slug]
+        if len(bits) > TAG_MASK_IN_LIMIT:
+            return queryset.alias(
+                tags_match=F('tags_mask').bitand(mask)
+            ).exclude(tags_match=0)
+        all_bits = 0
+        for bit in bits.values():
+            all_bits |= 1 << bit
+        masks = []
+        submask = all_bits
+        while submask:
+            if submask & mask:
+                masks.append(submask)
+            submask = (submask - 1) & all_bits
+        return queryset.filter(tags_mask__in=masks)
+
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(favoriterecipe__user=user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(shoppingcart__user=user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
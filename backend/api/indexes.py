@@ -0,0 +1,296 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.db import connections
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from recipes.utils import get_catalog_version, get_recipe_changes
+
+from .replicas import read_from_primary
+
+
+class IngredientPrefixIndex:
+    """Индекс ингредиентов по префиксу названия в памяти процесса.
+
+    Названия хранятся отсортированными в нижнем регистре, поэтому поиск
+    по префиксу сводится к двум бинарным поискам. Индекс перестраивается
+    при смене версии справочника ингредиентов и не реже раза в ttl
+    секунд, если кеш версий не общий для процессов.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.state = None
+
+    def is_stale(self, state, version):
+        return (state is None or state[0] != version
+                or time.monotonic() - state[1] > self.ttl)
+
+    def build(self, version):
+        entries = list(Ingredient.objects.values(
+            'id', 'name', 'measurement_unit'))
+        for rank, entry in enumerate(entries):
+            entry['rank'] = rank
+        entries.sort(key=lambda entry: entry['name'].lower())
+        keys = [entry['name'].lower() for entry in entries]
+        return version, time.monotonic(), keys, entries
+
+    def get_state(self):
+        version = get_catalog_version('ingredients')
+        state = self.state
+        if self.is_stale(state, version):
+            with self.lock:
+                state = self.state
+                if self.is_stale(state, version):
+                    with read_from_primary():
+                        state = self.state = self.build(version)
+        return state
+
+    def search(self, prefix, limit=None):
+        _, _, keys, entries = self.get_state()
+        prefix = prefix.lower()
+        start = bisect_left(keys, prefix)
+        end = bisect_right(keys, prefix + '\uffff', lo=start)
+        found = entries[start:end]
+        if limit is None:
+            found = sorted(found, key=lambda entry: entry['rank'])
+        else:
+            found = heapq.nsmallest(
+                limit, found, key=lambda entry: entry['rank'])
+        return found
+
+
+ingredient_index = IngredientPrefixIndex(
+    ttl=getattr(settings, 'INGREDIENT_INDEX_TTL', 60))
+
+
+def make_bitmap(positions, size):
+    """Битовая карта (целое число) с единицами в позициях positions."""
+    bits = bytearray(size // 8 + 1)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def iter_bits(bitmap):
+    """Позиции единичных битов карты по возрастанию."""
+    return (
+        position
+        for position, bit in enumerate(reversed(bin(bitmap)[2:]))
+        if bit == '1'
+    )
+
+
+def add_bitmap(counters, bitmap):
+    """Прибавляет карту к побитовым счётчикам (bit-sliced сложение)."""
+    carry = bitmap
+    for level, counter in enumerate(counters):
+        if not carry:
+            return
+        counters[level], carry = counter ^ carry, counter & carry
+    if carry:
+        counters.append(carry)
+
+
+class RecipeIngredientIndex:
+    """Инвертированный индекс ингредиент -> битовая карта рецептов.
+
+    Каждому рецепту соответствует позиция в порядке добавления в индекс.
+    Число ингредиентов рецепта хранится побитовыми срезами, поэтому
+    проверка полного покрытия — это только операции над картами.
+
+    Изменённые рецепты переносятся в индекс по журналу изменений версии
+    рецептов. Полная пересборка (при неполном журнале и не реже раза
+    в ttl секунд) идёт в фоновом потоке, запросы тем временем
+    используют прежний индекс.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.rebuild_lock = threading.Lock()
+        self.rebuilding = False
+        self.state = None
+
+    def build(self, version):
+        recipe_ids = []
+        sort_keys = []
+        positions = {}
+        for recipe_id, pub_date in Recipe.objects.order_by(
+                'id').values_list('id', 'pub_date'):
+            positions[recipe_id] = len(recipe_ids)
+            recipe_ids.append(recipe_id)
+            sort_keys.append((pub_date, recipe_id))
+        postings = {}
+        ingredients = [[] for _ in recipe_ids]
+        for ingredient_id, recipe_id in (
+            IngredientInRecipe.objects.order_by().values_list(
+                'ingredient_id', 'recipe_id').iterator()
+        ):
+            position = positions.get(recipe_id)
+            if position is None:
+                continue
+            postings.setdefault(ingredient_id, []).append(position)
+            ingredients[position].append(ingredient_id)
+        totals = [len(items) for items in ingredients]
+        size = len(recipe_ids)
+        total_slices = [
+            make_bitmap(
+                (position for position, total in enumerate(totals)
+                 if total >> level & 1),
+                size,
+            )
+            for level in range(max(totals, default=0).bit_length())
+        ]
+        return {
+            'version': version,
+            'built_at': time.monotonic(),
+            'recipe_ids': recipe_ids,
+            'positions': positions,
+            'sort_keys': sort_keys,
+            'ingredients': [tuple(items) for items in ingredients],
+            'bitmaps': {
+                ingredient_id: make_bitmap(items, size)
+                for ingredient_id, items in postings.items()
+            },
+            'total_slices': total_slices,
+        }
+
+    def patch(self, state, recipe_ids, version):
+        """Копия состояния с перечитанными из базы рецептами recipe_ids."""
+        pub_dates = dict(Recipe.objects.filter(
+            id__in=recipe_ids).values_list('id', 'pub_date'))
+        new_ingredients = {}
+        for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+                recipe_id__in=recipe_ids).order_by().values_list(
+                'recipe_id', 'ingredient_id'):
+            new_ingredients.setdefault(recipe_id, []).append(ingredient_id)
+        state = {
+            **state,
+            'version': version,
+            'recipe_ids': list(state['recipe_ids']),
+            'positions': dict(state['positions']),
+            'sort_keys': list(state['sort_keys']),
+            'ingredients': list(state['ingredients']),
+            'bitmaps': dict(state['bitmaps']),
+            'total_slices': list(state['total_slices']),
+        }
+        positions = state['positions']
+        bitmaps = state['bitmaps']
+        total_slices = state['total_slices']
+        for recipe_id in recipe_ids:
+            position = positions.get(recipe_id)
+            if position is None:
+                if recipe_id not in pub_dates:
+                    continue
+                position = positions[recipe_id] = len(state['recipe_ids'])
+                state['recipe_ids'].append(recipe_id)
+                state['sort_keys'].append(None)
+                state['ingredients'].append(())
+            bit = 1 << position
+            for ingredient_id in state['ingredients'][position]:
+                bitmap = bitmaps[ingredient_id] & ~bit
+                if bitmap:
+                    bitmaps[ingredient_id] = bitmap
+                else:
+                    del bitmaps[ingredient_id]
+            items = tuple(new_ingredients.get(recipe_id, ()))
+            for ingredient_id in items:
+                bitmaps[ingredient_id] = bitmaps.get(ingredient_id, 0) | bit
+            total = len(items)
+            while len(total_slices) < total.bit_length():
+                total_slices.append(0)
+            for level, total_slice in enumerate(total_slices):
+                if total >> level & 1:
+                    total_slices[level] = total_slice | bit
+                else:
+                    total_slices[level] = total_slice & ~bit
+            state['ingredients'][position] = items
+            if recipe_id in pub_dates:
+                state['sort_keys'][position] = (
+                    pub_dates[recipe_id], recipe_id)
+            else:
+                del positions[recipe_id]
+                state['recipe_ids'][position] = None
+        return state
+
+    def get_state(self):
+        version = get_catalog_version('recipes')
+        state = self.state
+        if state is not None and state['version'] == version:
+            if time.monotonic() - state['built_at'] > self.ttl:
+                self.schedule_rebuild()
+            return state
+        with self.lock:
+            state = self.state
+            if state is None:
+                with read_from_primary():
+                    state = self.state = self.build(version)
+            elif state['version'] != version:
+                recipe_ids = get_recipe_changes(state['version'], version)
+                if recipe_ids is None:
+                    self.schedule_rebuild()
+                else:
+                    with read_from_primary():
+                        state = self.state = self.patch(
+                            state, recipe_ids, version)
+        return state
+
+    def schedule_rebuild(self):
+        with self.rebuild_lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+        threading.Thread(target=self.rebuild, daemon=True).start()
+
+    def rebuild(self):
+        try:
+            state = self.build(get_catalog_version('recipes'))
+            with self.lock:
+                self.state = state
+        finally:
+            self.rebuilding = False
+            connections.close_all()
+
+    def search(self, ingredient_ids, full=False):
+        """Рецепты по числу покрытых ингредиентов, затем по новизне.
+
+        Возвращает список пар (id рецепта, число покрытых ингредиентов).
+        При full=True остаются только рецепты, все ингредиенты которых
+        входят в ingredient_ids.
+        """
+        state = self.get_state()
+        counters = []
+        candidates = 0
+        for ingredient_id in set(ingredient_ids):
+            bitmap = state['bitmaps'].get(ingredient_id, 0)
+            add_bitmap(counters, bitmap)
+            candidates |= bitmap
+        if full:
+            total_slices = state['total_slices']
+            for level in range(max(len(counters), len(total_slices))):
+                covered = counters[level] if level < len(counters) else 0
+                total = (total_slices[level]
+                         if level < len(total_slices) else 0)
+                candidates &= ~(covered ^ total)
+        covered = {}
+        for level, counter in enumerate(counters):
+            for position in iter_bits(counter & candidates):
+                covered[position] = covered.get(position, 0) + (1 << level)
+        recipe_ids = state['recipe_ids']
+        sort_keys = state['sort_keys']
+        return [
+            (recipe_ids[position], covered[position])
+            for position in sorted(
+                iter_bits(candidates),
+                key=lambda position: (covered[position], sort_keys[position]),
+                reverse=True,
+            )
+        ]
+
+
+recipe_ingredient_index = RecipeIngredientIndex(
+    ttl=getattr(settings, 'INGREDIENT_INDEX_TTL', 60))
@@ -0,0 +1,222 @@
+import hmac
+import random
+import threading
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+TIME_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+METRICS = (
+    ('foodgram_request_duration_seconds', 'Время обработки запроса.',
+     'total_time', TIME_BUCKETS),
+    ('foodgram_sql_duration_seconds', 'Время SQL-запросов.',
+     'sql_time', TIME_BUCKETS),
+    ('foodgram_sql_queries', 'Количество SQL-запросов.',
+     'sql_count', QUERY_BUCKETS),
+    ('foodgram_serializer_duration_seconds', 'Время сериализации.',
+     'serializer_time', TIME_BUCKETS),
+    ('foodgram_render_duration_seconds', 'Время рендеринга ответа.',
+     'render_time', TIME_BUCKETS),
+)
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.view = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.render_time = 0.0
+        self.total_time = 0.0
+        self.serializing = False
+
+    def record_query(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - start
+            self.sql_count += 1
+
+    def server_timing(self):
+        return ', '.join((
+            f'sql;desc="{self.sql_count} queries";'
+            f'dur={self.sql_time * 1000:.1f}',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def render(self, name, view):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{view="{view}",le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{view="{view}"}} {self.sum}'
+        yield f'{name}_count{{view="{view}"}} {self.count}'
+
+
+class MetricsRegistry:
+    """Гистограммы замеров по представлениям в памяти процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def observe(self, metrics):
+        view = metrics.view or 'unknown'
+        with self.lock:
+            histograms = self.views.get(view)
+            if histograms is None:
+                histograms = self.views[view] = [
+                    Histogram(buckets) for *_, buckets in METRICS
+                ]
+            for histogram, (_, _, attr, _) in zip(histograms, METRICS):
+                histogram.observe(getattr(metrics, attr))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for index, (name, help_text, _, _) in enumerate(METRICS):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histograms in sorted(self.views.items()):
+                    lines.extend(histograms[index].render(name, view))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def get_view_name(request, view_func):
+    """Имя представления вида RecipeViewSet.list."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return view_func.__name__
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None)
+    if actions is not None:
+        method = actions.get(method, method)
+    return f'{cls.__name__}.{method}'
+
+
+class MetricsMiddleware:
+    """Замеряет SQL, сериализацию и рендеринг выборочных запросов.
+
+    Результат отдаётся в заголовке Server-Timing и накапливается
+    в гистограммах, доступных по /metrics. Доля замеряемых запросов
+    задаётся METRICS_SAMPLE_RATE; при 0 middleware ничего не делает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.METRICS_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.record_query))
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        metrics.total_time = perf_counter() - start
+        response['Server-Timing'] = metrics.server_timing()
+        registry.observe(metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.view = get_view_name(request, view_func)
+
+    def process_template_response(self, request, response):
+        metrics = current_metrics.get()
+        if metrics is not None:
+            start = perf_counter()
+
+            def rendered(response):
+                metrics.render_time = perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+@contextmanager
+def measure_serialization():
+    """Учитывает время сериализации в замерах текущего запроса.
+
+    Вложенные замеры не учитываются повторно.
+    """
+    metrics = current_metrics.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += perf_counter() - start
+        metrics.serializing = False
+
+
+class TimedSerializerMixin:
+    """Учитывает время сериализации в замерах текущего запроса."""
+
+    def to_representation(self, instance):
+        with measure_serialization():
+            return super().to_representation(instance)
+
+
+def has_metrics_access(request):
+    """Метрики видны персоналу и сборщику с токеном METRICS_TOKEN."""
+    if request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    return bool(token) and hmac.compare_digest(
+        request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+def metrics_view(request):
+    if not has_metrics_access(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from recipes.utils import get_catalog_version
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+
+from .replicas import (is_pinned_to_primary, pin_to_primary, read_from_primary,
+                       replica_alias, use_replica)
+
+
+class ReplicaReadMixin:
+    """Безопасные запросы читают из реплики.
+
+    После успешной записи пользователь на REPLICA_STICKY_SECONDS
+    закрепляется за основной базой, чтобы видеть свои изменения.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        use_token = use_replica.set(False)
+        alias_token = replica_alias.set(None)
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        finally:
+            replica_alias.reset(alias_token)
+            use_replica.reset(use_token)
+        if (self.request.method not in SAFE_METHODS
+                and status.is_success(response.status_code)):
+            pin_to_primary(self.request.user)
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (settings.DATABASE_REPLICAS
+                and request.method in SAFE_METHODS
+                and not is_pinned_to_primary(request.user)):
+            use_replica.set(True)
+
+
+class CatalogCacheMixin:
+    """Кеширование готовых ответов справочника по его версии.
+
+    Версия справочника увеличивается при любом изменении, поэтому
+    закешированные байты и ETag устаревают сами собой. Повторный запрос
+    с совпадающим If-None-Match получает 304 без обращения к базе.
+    """
+    catalog = None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        version = get_catalog_version(self.catalog)
+        renderer_format = request.accepted_renderer.format
+        etag = quote_etag(f'{self.catalog}-{version}-{renderer_format}')
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            key = (f'catalog:{self.catalog}:{version}:{renderer_format}:'
+                   f'{request.get_full_path()}')
+            cached = cache.get(key)
+            if cached is None:
+                # Кешируемые байты читаются из основной базы: реплика
+                # может ещё не содержать изменение, сменившее версию.
+                with read_from_primary():
+                    response = self.finalize_response(
+                        request, handler(request, *args, **kwargs),
+                        *args, **kwargs)
+                response.render()
+                if response.status_code != 200:
+                    return response
+                cached = (response.content, response['Content-Type'])
+                cache.set(key, cached, settings.CATALOG_CACHE_TIMEOUT)
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        patch_cache_control(
+            response, public=True, max_age=settings.CATALOG_MAX_AGE)
+        patch_vary_headers(response, ('Accept',))
+        return response
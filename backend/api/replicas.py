@@ -0,0 +1,98 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+use_replica = ContextVar('use_replica', default=False)
+replica_alias = ContextVar('replica_alias', default=None)
+
+# Время (time.monotonic), до которого реплика считается недоступной.
+unavailable_until = {}
+
+
+def get_primary_pin_key(user_id):
+    return f'db:primary:{user_id}'
+
+
+def pin_to_primary(user):
+    """Направляет чтения пользователя в основную базу после записи."""
+    cache.set(
+        get_primary_pin_key(user.pk), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    return user.is_authenticated and bool(
+        cache.get(get_primary_pin_key(user.pk)))
+
+
+@contextmanager
+def read_from_primary():
+    """Чтения внутри блока идут в основную базу.
+
+    Нужно для данных, которые кешируются под версией, меняющейся только
+    после записи: отстающая реплика оставила бы под новой версией
+    данные до записи.
+    """
+    token = use_replica.set(False)
+    try:
+        yield
+    finally:
+        use_replica.reset(token)
+
+
+def get_healthy_replica():
+    """Случайная доступная реплика или None.
+
+    Постоянное соединение с репликой проверяется перед использованием;
+    реплика, к которой не удалось подключиться, пропускается
+    на REPLICA_RETRY_SECONDS.
+    """
+    aliases = list(settings.DATABASE_REPLICAS)
+    random.shuffle(aliases)
+    now = time.monotonic()
+    for alias in aliases:
+        if unavailable_until.get(alias, 0) > now:
+            continue
+        connection = connections[alias]
+        try:
+            if (connection.connection is not None
+                    and not connection.is_usable()):
+                connection.close()
+            connection.ensure_connection()
+        except DatabaseError:
+            unavailable_until[alias] = now + settings.REPLICA_RETRY_SECONDS
+            continue
+        return alias
+    return None
+
+
+class ReplicaRouter:
+    """Чтение из реплики для безопасных запросов.
+
+    ReplicaReadMixin разрешает реплику только для безопасных запросов;
+    сама реплика выбирается и проверяется при первом чтении, поэтому
+    запросы без обращения к базе не тратят времени на проверку.
+    Всё остальное, включая запись, идёт в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not use_replica.get():
+            return None
+        alias = replica_alias.get()
+        if alias is None:
+            alias = get_healthy_replica() or DEFAULT_DB_ALIAS
+            replica_alias.set(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -1,16 +1,23 @@
-from django.db import transaction
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
+from recipes.images import get_variant_urls, schedule_variants
 from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
                             Recipe, ShoppingCart, Tag)
+from recipes.utils import refresh_cart_totals
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
-from rest_framework.fields import (IntegerField, ReadOnlyField,
+from rest_framework.fields import (IntegerField, ListField, ReadOnlyField,
                                    SerializerMethodField)
 from rest_framework.relations import PrimaryKeyRelatedField
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import ModelSerializer, Serializer
 from users.models import Subscribe, User
 
+from .fields import HashedBase64ImageField
+from .metrics import TimedSerializerMixin
+from .utils import get_recipes_limit
+
 
 class UserCreateSerializer(UserCreateSerializer):
     class Meta:
@@ -25,7 +32,7 @@ class UserCreateSerializer(UserCreateSerializer):
         )
 
 
-class UserListSerializer(UserSerializer):
+class UserListSerializer(TimedSerializerMixin, UserSerializer):
     is_subscribed = SerializerMethodField(read_only=True)
 
     class Meta:
@@ -43,11 +50,34 @@ class UserListSerializer(UserSerializer):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
-        return Subscribe.objects.filter(user=user, author=obj).exists()
+        if 'subscriptions' not in self.context:
+            self.context['subscriptions'] = set(
+                Subscribe.objects.filter(user=user).values_list(
+                    'author_id', flat=True)
+            )
+        return obj.id in self.context['subscriptions']
+
 
+class ImageVariantsMixin:
+    """Ссылки на уменьшенные копии изображения рецепта."""
+
+    def get_image_variants(self, obj):
+        if not obj.image_variants_ready:
+            return None
+        urls = get_variant_urls(obj.image.name)
+        request = self.context.get('request')
+        if request is not None:
+            urls = {
+                variant: request.build_absolute_uri(url)
+                for variant, url in urls.items()
+            }
+        return urls
 
-class SubscribeRecipeSerializer(ModelSerializer):
+
+class SubscribeRecipeSerializer(TimedSerializerMixin, ImageVariantsMixin,
+                                ModelSerializer):
     image = Base64ImageField()
+    image_variants = SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -55,6 +85,7 @@ class SubscribeRecipeSerializer(ModelSerializer):
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time',
         )
 
@@ -93,20 +124,23 @@ class SubscribeSerializer(UserListSerializer):
         return data
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
+        if 'recipes' in self.context:
+            return SubscribeRecipeSerializer(
+                self.context['recipes'][obj.id],
+                many=True).data
+        limit = get_recipes_limit(self.context.get('request'))
         recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[:int(limit)]
+        if limit is not None:
+            recipes = recipes[:limit]
         return SubscribeRecipeSerializer(
             recipes,
             many=True).data
 
 
-class IngredientSerializer(ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, ModelSerializer):
     class Meta:
         model = Ingredient
         fields = (
@@ -116,10 +150,10 @@ class IngredientSerializer(ModelSerializer):
         )
 
 
-class TagSerializer(ModelSerializer):
+class TagSerializer(TimedSerializerMixin, ModelSerializer):
     class Meta:
         model = Tag
-        fields = '__all__'
+        fields = ('id', 'name', 'color', 'slug')
 
 
 class RecipeIngredientSerializer(ModelSerializer):
@@ -140,7 +174,8 @@ class RecipeIngredientSerializer(ModelSerializer):
         )
 
 
-class RecipeReadSerializer(ModelSerializer):
+class RecipeReadSerializer(TimedSerializerMixin, ImageVariantsMixin,
+                           ModelSerializer):
     author = UserListSerializer(
         read_only=True
     )
@@ -149,6 +184,7 @@ class RecipeReadSerializer(ModelSerializer):
         read_only=True
     )
     image = Base64ImageField()
+    image_variants = SerializerMethodField()
     ingredients = RecipeIngredientSerializer(
         many=True,
         source='recipe',
@@ -168,11 +204,14 @@ class RecipeReadSerializer(ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return (self.context.get('request').user.is_authenticated
                 and FavoriteRecipe.objects.filter(
                     user=self.context.get('request').user,
@@ -180,6 +219,8 @@ class RecipeReadSerializer(ModelSerializer):
         ).exists())
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return (self.context.get('request').user.is_authenticated
                 and ShoppingCart.objects.filter(
                     user=self.context.get('request').user,
@@ -197,7 +238,7 @@ class IngredientsEditSerializer(ModelSerializer):
 
 
 class RecipeEditSerializer(ModelSerializer):
-    image = Base64ImageField()
+    image = HashedBase64ImageField(upload_to='recipes/images')
     ingredients = IngredientsEditSerializer(
         many=True
     )
@@ -269,13 +310,13 @@ class RecipeEditSerializer(ModelSerializer):
 
     @transaction.atomic
     def create_ingredients_amounts(self, ingredients, recipe):
-        for ingredient in ingredients:
-            IngredientInRecipe.objects.bulk_create([
-                IngredientInRecipe(
-                    ingredient_id=ingredient.get('id'),
-                    recipe=recipe,
-                    amount=ingredient.get('amount'),)
-            ])
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(
+                ingredient_id=ingredient.get('id'),
+                recipe=recipe,
+                amount=ingredient.get('amount'),)
+            for ingredient in ingredients
+        ])
 
     @transaction.atomic
     def create(self, validated_data):
@@ -284,6 +325,7 @@ class RecipeEditSerializer(ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients_amounts(ingredients, recipe)
+        schedule_variants(recipe.image.name)
         return recipe
 
     @transaction.atomic
@@ -291,11 +333,24 @@ class RecipeEditSerializer(ModelSerializer):
         ingredients = validated_data.pop('ingredients', None)
         tags = validated_data.pop('tags', None)
         if ingredients:
+            ingredient_ids = set(instance.recipe.values_list(
+                'ingredient_id', flat=True))
             instance.ingredients.clear()
             self.create_ingredients_amounts(ingredients, instance)
+            ingredient_ids.update(
+                ingredient['id'] for ingredient in ingredients)
+            refresh_cart_totals(
+                instance.shoppingcart.values_list('user_id', flat=True),
+                ingredient_ids,
+            )
         if tags:
             instance.tags.set(tags)
-        return super().update(instance, validated_data)
+        if 'image' in validated_data:
+            validated_data['image_variants_ready'] = False
+        instance = super().update(instance, validated_data)
+        if not instance.image_variants_ready:
+            schedule_variants(instance.image.name)
+        return instance
 
     def to_representation(self, instance):
         return RecipeReadSerializer(
@@ -311,7 +366,7 @@ class RecipeBriefSerializer(ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
-class RecipeShortSerializer(ModelSerializer):
+class RecipeShortSerializer(TimedSerializerMixin, ModelSerializer):
     """Серилизатор полей избранных рецептов и покупок."""
 
     class Meta:
@@ -339,6 +394,14 @@ class FavoriteSerializer(ModelSerializer):
             )
         return data
 
+    def create(self, validated_data):
+        # Параллельный запрос мог добавить рецепт после проверки в validate.
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise ValidationError('Рецепт уже добавлен в избранное.')
+
     def to_representation(self, instance):
         return RecipeShortSerializer(
             instance.recipe,
@@ -362,8 +425,35 @@ class ShopListSerializer(ModelSerializer):
             )
         return data
 
+    def create(self, validated_data):
+        # Параллельный запрос мог добавить рецепт после проверки в validate.
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise ValidationError('Рецепт уже добавлен в корзину')
+
     def to_representation(self, instance):
         return RecipeShortSerializer(
             instance.recipe,
             context={'request': self.context.get('request')}
         ).data
+
+
+class RecipeIdsSerializer(Serializer):
+    """Список рецептов для массового добавления и удаления."""
+    recipes = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RECIPES_LIMIT,
+    )
+
+    def validate_recipes(self, value):
+        recipe_ids = list(dict.fromkeys(value))
+        found = set(Recipe.objects.filter(
+            id__in=recipe_ids).values_list('id', flat=True))
+        missing = [str(pk) for pk in recipe_ids if pk not in found]
+        if missing:
+            raise ValidationError(
+                f'Рецепты не найдены: {", ".join(missing)}.')
+        return recipe_ids
@@ -0,0 +1,58 @@
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import User
+
+TEST_IMAGE = 'recipes/images/test.png'
+
+
+def create_users(count):
+    return [
+        User.objects.create_user(
+            username=f'user{index}',
+            email=f'user{index}@example.com',
+            password='Passw0rd!',
+            first_name='Имя',
+            last_name=f'Фамилия{index}',
+        )
+        for index in range(count)
+    ]
+
+
+def create_catalog():
+    tags = [
+        Tag.objects.create(name=name, color=color, slug=slug)
+        for name, color, slug in (
+            ('Завтрак', '#E26C2D', 'breakfast'),
+            ('Обед', '#49B64E', 'dinner'),
+            ('Ужин', '#8775D2', 'supper'),
+        )
+    ]
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {index}', measurement_unit='г')
+        for index in range(20)
+    )
+    return tags, list(Ingredient.objects.order_by('id'))
+
+
+def create_recipes(count, authors, tags, ingredients):
+    """Рецепты с двумя тегами и тремя ингредиентами каждый."""
+    recipes = []
+    for index in range(count):
+        recipe = Recipe.objects.create(
+            author=authors[index % len(authors)],
+            name=f'Рецепт {index}',
+            text='Описание рецепта.',
+            image=TEST_IMAGE,
+            cooking_time=index % 120 + 1,
+        )
+        recipe.tags.set(
+            [tags[index % len(tags)], tags[(index + 1) % len(tags)]])
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient=ingredients[(index + offset) % len(ingredients)],
+                amount=offset + 1,
+            )
+            for offset in range(3)
+        )
+        recipes.append(recipe)
+    return recipes
@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.test import TestCase
+from recipes.models import (FavoriteRecipe, Recipe, ShoppingCart,
+                            ShoppingCartIngredient)
+from recipes.utils import get_cart_totals
+from rest_framework.test import APIClient
+
+from .fixtures import create_catalog, create_recipes, create_users
+
+
+class BulkEndpointsTest(TestCase):
+    """Массовые операции не зависят по числу запросов от длины списка."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, author = create_users(2)
+        tags, ingredients = create_catalog()
+        cls.recipes = create_recipes(50, [author], tags, ingredients)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_same_queries(self, method, url, queries):
+        for count in (5, 50):
+            data = {'recipes': [recipe.id for recipe in self.recipes[:count]]}
+            if method == 'delete':
+                self.client.post(url, data, format='json')
+            with self.subTest(count=count), self.assertNumQueries(queries):
+                response = getattr(self.client, method)(
+                    url, data, format='json')
+            self.assertLess(response.status_code, 300)
+
+    def assert_favorites_count(self):
+        favorites = set(FavoriteRecipe.objects.values_list(
+            'recipe_id', flat=True))
+        for recipe_id, count in Recipe.objects.values_list(
+                'id', 'favorites_count'):
+            self.assertEqual(count, int(recipe_id in favorites))
+
+    def assert_cart_totals(self):
+        self.assertCountEqual(
+            ShoppingCartIngredient.objects.values(
+                'user_id', 'ingredient_id', 'total_amount'),
+            [row for row in get_cart_totals() if row['ingredient_id']],
+        )
+
+    def test_favorite_post(self):
+        # Проверка рецептов, запись, счётчики и ответ внутри savepoint.
+        self.assert_same_queries('post', '/api/recipes/favorite/', 6)
+        self.assert_favorites_count()
+
+    def test_favorite_delete(self):
+        self.assert_same_queries('delete', '/api/recipes/favorite/', 6)
+        self.assert_favorites_count()
+
+    def test_shopping_cart_post(self):
+        # Плюс ингредиенты рецептов, удаление, пересчёт и вставка сумм.
+        self.assert_same_queries('post', '/api/recipes/shopping_cart/', 11)
+        self.assert_cart_totals()
+
+    def test_shopping_cart_delete(self):
+        self.assert_same_queries('delete', '/api/recipes/shopping_cart/', 10)
+        self.assertFalse(ShoppingCart.objects.exists())
+        self.assert_cart_totals()
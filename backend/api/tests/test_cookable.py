@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.test import TestCase
+from recipes.models import IngredientInRecipe, Recipe
+
+from ..indexes import recipe_ingredient_index
+from .fixtures import create_catalog, create_recipes, create_users
+
+
+class CookableIndexTest(TestCase):
+    """Индекс /cookable/ обновляется по изменённым рецептам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = create_users(2)
+        cls.tags, cls.ingredients = create_catalog()
+        cls.recipes = create_recipes(10, authors, cls.tags, cls.ingredients)
+
+    def setUp(self):
+        cache.clear()
+        recipe_ingredient_index.state = None
+
+    def get_cookable(self, ingredients, full=False):
+        url = '/api/recipes/cookable/?ingredients=' + ','.join(
+            str(ingredient.id) for ingredient in ingredients)
+        if full:
+            url += '&full=1'
+        return [recipe['id'] for recipe in self.client.get(url).json()[
+            'results']]
+
+    def test_edit_patches_index(self):
+        spare = self.ingredients[-1]
+        self.assertEqual(self.get_cookable([spare]), [])
+        built_at = recipe_ingredient_index.state['built_at']
+        recipe = self.recipes[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientInRecipe.objects.filter(recipe=recipe).delete()
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=spare, amount=1)
+        self.assertEqual(self.get_cookable([spare], full=True), [recipe.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            new_recipe = Recipe.objects.create(
+                author=recipe.author, name='Новый рецепт', text='Текст',
+                image=recipe.image, cooking_time=10)
+            IngredientInRecipe.objects.create(
+                recipe=new_recipe, ingredient=spare, amount=2)
+            recipe.delete()
+        self.assertEqual(self.get_cookable([spare]), [new_recipe.id])
+        self.assertEqual(
+            recipe_ingredient_index.state['built_at'], built_at)
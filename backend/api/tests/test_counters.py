@@ -0,0 +1,56 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe, Tag
+
+from .fixtures import TEST_IMAGE, create_users
+
+
+class CounterFieldsSaveTest(TestCase):
+    """save() не перезаписывает счётчики и уважает update_fields."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, = create_users(1)
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Описание.',
+            image=TEST_IMAGE, cooking_time=5,
+        )
+
+    def get_update(self, instance, **kwargs):
+        table = instance._meta.db_table
+        with CaptureQueriesContext(connection) as context:
+            instance.save(**kwargs)
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith(f'UPDATE "{table}" SET')
+        ]
+        self.assertLessEqual(len(updates), 1)
+        return updates[0] if updates else ''
+
+    def test_full_save_skips_counters(self):
+        sql = self.get_update(self.user)
+        self.assertIn('"first_name"', sql)
+        self.assertNotIn('"recipes_count"', sql)
+        sql = self.get_update(self.recipe)
+        self.assertIn('"name"', sql)
+        self.assertNotIn('"favorites_count"', sql)
+        self.assertNotIn('"tags_mask"', sql)
+
+    def test_update_fields_are_kept(self):
+        sql = self.get_update(self.user, update_fields=['last_login'])
+        self.assertIn('"last_login"', sql)
+        self.assertNotIn('"first_name"', sql)
+
+    def test_counters_removed_from_update_fields(self):
+        sql = self.get_update(
+            self.user, update_fields=['first_name', 'followers_count'])
+        self.assertIn('"first_name"', sql)
+        self.assertNotIn('"followers_count"', sql)
+        self.recipe.tags.add(Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'))
+        self.recipe.tags_mask = 0
+        self.assertEqual(
+            self.get_update(self.recipe, update_fields=['tags_mask']), '')
+        self.recipe.refresh_from_db()
+        self.assertNotEqual(self.recipe.tags_mask, 0)
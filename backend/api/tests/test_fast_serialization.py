@@ -0,0 +1,75 @@
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart
+from rest_framework.test import APIClient
+from users.models import Subscribe
+
+from ..renderers import FastJSONRenderer
+from .fixtures import create_catalog, create_recipes, create_users
+
+
+class FastSerializationParityTest(TestCase):
+    """Список рецептов из values() совпадает с RecipeReadSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(4)
+        cls.tags, ingredients = create_catalog()
+        recipes = create_recipes(40, cls.users[1:], cls.tags, ingredients)
+        Recipe.objects.filter(pk=recipes[0].pk).update(
+            text='Строка с "кавычками", \\ и <тегами>\n\tи эмодзи 🍲')
+        Recipe.objects.filter(pk=recipes[1].pk).update(
+            image_variants_ready=True)
+        Recipe.objects.filter(pk=recipes[2].pk).update(image='')
+        user = cls.users[0]
+        Subscribe.objects.create(user=user, author=cls.users[1])
+        for recipe in recipes[::3]:
+            FavoriteRecipe.objects.create(user=user, recipe=recipe)
+        for recipe in recipes[::4]:
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_queries(self):
+        return [
+            {},
+            {'pagination': 'cursor'},
+            {'limit': 7},
+            {'is_favorited': 1},
+            {'is_in_shopping_cart': 1},
+            {'tags': self.tags[0].slug},
+            {'author': self.users[1].id},
+            {'search': 'Рецепт'},
+        ]
+
+    def fetch(self, client, url, fast):
+        with override_settings(RECIPE_FAST_SERIALIZATION=fast):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertEqual(
+            isinstance(response.accepted_renderer, FastJSONRenderer), fast)
+        return response
+
+    def assert_pages_match(self, client):
+        for query in self.get_queries():
+            url = '/api/recipes/?' + urlencode(query)
+            pages = 0
+            while url is not None:
+                with self.subTest(url=url):
+                    expected = self.fetch(client, url, fast=False)
+                    actual = self.fetch(client, url, fast=True)
+                    self.assertEqual(actual.content, expected.content)
+                url = expected.json()['next']
+                pages += 1
+            self.assertGreater(pages, 1, query)
+
+    def test_anonymous(self):
+        self.assert_pages_match(APIClient())
+
+    def test_authenticated(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        self.assert_pages_match(client)
@@ -0,0 +1,37 @@
+from django.test import TestCase, override_settings
+from users.models import User
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsAccessTest(TestCase):
+    """Эндпоинт /metrics закрыт от посторонних."""
+
+    def test_anonymous(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_regular_user(self):
+        self.client.force_login(User.objects.create_user(
+            username='user', email='user@example.com', password='x'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_staff(self):
+        self.client.force_login(User.objects.create_user(
+            username='staff', email='staff@example.com', password='x',
+            is_staff=True))
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_token(self):
+        for header, status in (
+            ('Bearer secret', 200),
+            ('Bearer wrong', 403),
+            ('Token secret', 403),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    '/metrics', HTTP_AUTHORIZATION=header)
+                self.assertEqual(response.status_code, status)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_disables_token_access(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
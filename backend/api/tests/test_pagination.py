@@ -0,0 +1,70 @@
+from contextlib import nullcontext
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .fixtures import create_catalog, create_recipes, create_users
+
+
+def postgresql_connections(row=None, error=None):
+    """Подменяет соединение PostgreSQL с заданной строкой EXPLAIN."""
+    cursor = mock.MagicMock()
+    cursor.__enter__.return_value = cursor
+    cursor.fetchone.return_value = row
+    cursor.execute.side_effect = error
+    connection = mock.MagicMock(vendor='postgresql')
+    connection.cursor.return_value = cursor
+    connections = mock.MagicMock()
+    connections.__getitem__.return_value = connection
+    return mock.patch('api.pagination.connections', connections), cursor
+
+
+class ApproximateCountTest(TestCase):
+    """Оценка числа рецептов из EXPLAIN (FORMAT JSON)."""
+
+    url = '/api/recipes/?pagination=cursor&count=approx'
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalog()
+        create_recipes(3, create_users(1), tags, ingredients)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_count(self, patcher):
+        with patcher:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 3)
+        return response.json()['count']
+
+    def test_decoded_json_row(self):
+        # psycopg2 возвращает json-колонку уже разобранной.
+        patcher, cursor = postgresql_connections(
+            ([{'Plan': {'Node Type': 'Sort', 'Plan Rows': 1234}}],))
+        self.assertEqual(self.get_count(patcher), 1234)
+        sql = cursor.execute.call_args[0][0]
+        self.assertTrue(sql.startswith('EXPLAIN (FORMAT JSON) SELECT'))
+
+    def test_text_row(self):
+        patcher, _ = postgresql_connections(
+            ('[{"Plan": {"Node Type": "Sort", "Plan Rows": 42}}]',))
+        self.assertEqual(self.get_count(patcher), 42)
+
+    def test_errors_give_no_count(self):
+        for patcher, _ in (
+            postgresql_connections(error=OperationalError('timeout')),
+            postgresql_connections(('not json',)),
+            postgresql_connections(([{}],)),
+        ):
+            with self.subTest():
+                self.assertIsNone(self.get_count(patcher))
+
+    def test_other_vendors(self):
+        # SQLite не даёт оценки, запросов EXPLAIN не выполняется.
+        self.assertIsNone(self.get_count(nullcontext()))
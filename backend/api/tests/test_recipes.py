@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.test import TestCase
+from recipes.models import FavoriteRecipe, ShoppingCart
+from rest_framework.test import APIClient
+from users.models import Subscribe
+
+from .fixtures import create_catalog, create_recipes, create_users
+
+
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(4)
+        tags, ingredients = create_catalog()
+        recipes = create_recipes(120, cls.users[1:], tags, ingredients)
+        user = cls.users[0]
+        Subscribe.objects.create(user=user, author=cls.users[1])
+        for recipe in recipes[:10]:
+            FavoriteRecipe.objects.create(user=user, recipe=recipe)
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def assert_same_queries(self, queries):
+        for limit in (6, 100):
+            with self.subTest(limit=limit), self.assertNumQueries(queries):
+                response = self.client.get(f'/api/recipes/?limit={limit}')
+            self.assertEqual(len(response.json()['results']), limit)
+
+    def test_anonymous(self):
+        # COUNT, рецепты с авторами, теги, ингредиенты.
+        self.assert_same_queries(4)
+
+    def test_authenticated(self):
+        self.client.force_authenticate(self.users[0])
+        # Плюс подписки пользователя для is_subscribed.
+        self.assert_same_queries(5)
@@ -0,0 +1,93 @@
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+
+from .fixtures import TEST_IMAGE, create_users
+
+
+class SearchTestMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        author, = create_users(1)
+        cls.recipes = {
+            key: Recipe.objects.create(
+                author=author, name=name, text=text,
+                image=TEST_IMAGE, cooking_time=10,
+            )
+            for key, name, text in (
+                # Порядок создания обратен порядку релевантности.
+                ('both', 'Борщ зелёный', 'Борщ со щавелем.'),
+                ('name', 'Борщ', 'Свёкла, капуста и картофель.'),
+                ('text', 'Суп дня', 'Борщ со сметаной и зеленью.'),
+                ('other', 'Салат', 'Огурцы и помидоры.'),
+            )
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            '/api/recipes/', {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, *keys):
+        return [self.recipes[key].id for key in keys]
+
+
+class RecipeSearchTest(SearchTestMixin, TestCase):
+    """Поиск по названию и описанию в порядке релевантности."""
+
+    def test_ranked_by_relevance(self):
+        results = self.search('борщ')['results']
+        self.assertEqual(
+            [recipe['id'] for recipe in results],
+            self.ids('both', 'name', 'text'),
+        )
+
+    def test_cursor_mode_keeps_ranking(self):
+        data = self.search('борщ', pagination='cursor', limit=2)
+        self.assertEqual(
+            [recipe['id'] for recipe in data['results']],
+            self.ids('both', 'name'),
+        )
+        # Используется постраничный режим с точным числом результатов.
+        self.assertEqual(data['count'], 3)
+        self.assertIn('page=2', data['next'])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Требуется PostgreSQL.')
+class PostgresSearchTest(SearchTestMixin, TestCase):
+    """Поиск по колонке tsvector с GIN-индексом."""
+
+    def test_search_vector_is_filled(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {Recipe._meta.db_table} '
+                f'WHERE search_vector IS NULL'
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_stemming(self):
+        # Словоформы сводятся к основе конфигурацией SEARCH_CONFIG.
+        results = self.search('борща')['results']
+        self.assertEqual(
+            [recipe['id'] for recipe in results],
+            self.ids('both', 'name', 'text'),
+        )
+
+    def test_index_follows_edits(self):
+        recipe = self.recipes['other']
+        recipe.text = 'Холодный борщ.'
+        recipe.save()
+        self.assertIn(
+            recipe.id,
+            [recipe['id'] for recipe in self.search('борщ')['results']],
+        )
@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import Subscribe
+
+from .fixtures import create_catalog, create_recipes, create_users
+
+
+class SubscriptionsRecipesLimitTest(TestCase):
+    """Параметр recipes_limit страницы подписок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, *authors = create_users(3)
+        tags, ingredients = create_catalog()
+        create_recipes(8, authors, tags, ingredients)
+        for author in authors:
+            Subscribe.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_recipe_counts(self, query):
+        response = self.client.get(f'/api/users/subscriptions/{query}')
+        self.assertEqual(response.status_code, 200)
+        return [
+            len(author['recipes']) for author in response.json()['results']
+        ]
+
+    def test_limit(self):
+        self.assertEqual(self.get_recipe_counts('?recipes_limit=2'), [2, 2])
+
+    def test_invalid_limit_is_ignored(self):
+        for value in ('abc', '0', '-1', ''):
+            with self.subTest(value=value):
+                self.assertEqual(
+                    self.get_recipe_counts(f'?recipes_limit={value}'), [4, 4])
@@ -1,33 +1,113 @@
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
-from recipes.models import ShoppingCart
+import csv
+import json
+from itertools import chain
+
+from django.db import connection
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from recipes.models import Recipe, ShoppingCartIngredient
 from rest_framework import status
+from rest_framework.pagination import _positive_int
 from rest_framework.response import Response
-from users.models import User
+
+SHOPPING_LIST_FIELDS = ('name', 'measurement_unit', 'amount')
+
+
+class Echo:
+    """Файлоподобный объект, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def write_txt(rows):
+    yield 'Список покупок:\n\n'
+    for row in rows:
+        yield (
+            f'{row["name"]} ({row["measurement_unit"]})'
+            f' — {row["amount"]}\n'
+        )
+
+
+def write_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(SHOPPING_LIST_FIELDS)
+    for row in rows:
+        yield writer.writerow(row[field] for field in SHOPPING_LIST_FIELDS)
+
+
+def write_json(rows):
+    separator = '[\n'
+    for row in rows:
+        yield separator + json.dumps(row, ensure_ascii=False)
+        separator = ',\n'
+    yield '\n]\n'
+
+
+SHOPPING_LIST_WRITERS = {
+    'txt': write_txt,
+    'csv': write_csv,
+    'json': write_json,
+}
 
 
 def download_cart(request):
-    user = get_object_or_404(User, username=request.user.username)
-    user_cart = ShoppingCart.objects.filter(user=user)
-    if not user_cart.exists():
+    cart = ShoppingCartIngredient.objects.filter(user=request.user).values(
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+        amount=F('total_amount'),
+    ).order_by('name')
+    rows = cart.iterator()
+    first = next(rows, None)
+    if first is None:
         return Response(
             'В корзине нет товаров', status=status.HTTP_400_BAD_REQUEST)
 
-    text = 'Список покупок:\n\n'
-    ingredient_name = 'recipe__recipe__ingredient__name'
-    ingredient_unit = 'recipe__recipe__ingredient__measurement_unit'
-    recipe_amount = 'recipe__recipe__amount'
-    amount_sum = 'recipe__recipe__amount__sum'
-    cart = user_cart.select_related('recipe').values(
-        ingredient_name, ingredient_unit).annotate(Sum(
-            recipe_amount)).order_by(ingredient_name)
-    for _ in cart:
-        text += (
-            f'{_[ingredient_name]} ({_[ingredient_unit]})'
-            f' — {_[amount_sum]}\n'
-        )
-    response = HttpResponse(text, content_type='text/plain')
-    filename = 'shopping_list.txt'
+    renderer = request.accepted_renderer
+    writer = SHOPPING_LIST_WRITERS[renderer.format]
+    response = StreamingHttpResponse(
+        writer(chain((first,), rows)),
+        content_type=f'{renderer.media_type}; charset=utf-8',
+    )
+    filename = f'shopping_list.{renderer.format}'
     response['Content-Disposition'] = f'attachment; filename={filename}'
     return response
+
+
+def get_recipes_limit(request):
+    """Параметр recipes_limit; без него или при ошибке — без ограничения."""
+    try:
+        return _positive_int(
+            request.query_params['recipes_limit'], strict=True)
+    except (KeyError, ValueError):
+        return None
+
+
+def get_recipes_by_author(author_ids, limit=None):
+    """Первые limit рецептов каждого автора одним оконным запросом."""
+    recipes = {author_id: [] for author_id in author_ids}
+    if not recipes:
+        return recipes
+    table = Recipe._meta.db_table
+    # Только колонки модели: служебные, вроде search_vector, не нужны.
+    columns = ', '.join(
+        connection.ops.quote_name(field.column)
+        for field in Recipe._meta.concrete_fields
+    )
+    placeholders = ', '.join(['%s'] * len(recipes))
+    params = list(recipes)
+    query = (
+        f'SELECT * FROM ('
+        f'SELECT {columns}, ROW_NUMBER() OVER ('
+        f'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+        f') AS row_number FROM {table} '
+        f'WHERE author_id IN ({placeholders})'
+        f') AS ranked'
+    )
+    if limit is not None:
+        query += ' WHERE row_number <= %s'
+        params.append(limit)
+    query += ' ORDER BY author_id, row_number'
+    for recipe in Recipe.objects.raw(query, params):
+        recipes[recipe.author_id].append(recipe)
+    return recipes
@@ -1,53 +1,174 @@
+from copy import deepcopy
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingCart,
-                            Tag)
+from recipes.images import get_variant_urls
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, Tag)
+from recipes.utils import (get_feed, get_recipe_cache_key, refresh_cart_totals,
+                           refresh_favorites_count)
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import _positive_int
 from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from users.models import Subscribe
 
+from .fast import get_recipe_rows, serialize_recipes
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPagination
+from .indexes import ingredient_index, recipe_ingredient_index
+from .mixins import CatalogCacheMixin, ReplicaReadMixin
+from .pagination import CustomPagination, RecipePagination
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from .renderers import CSVRenderer, FastJSONRenderer, PlainTextRenderer
+from .replicas import read_from_primary
 from .serializers import (FavoriteSerializer, IngredientSerializer,
                           RecipeBriefSerializer, RecipeEditSerializer,
-                          RecipeReadSerializer, ShopListSerializer,
-                          TagSerializer)
+                          RecipeIdsSerializer, RecipeReadSerializer,
+                          ShopListSerializer, TagSerializer)
 from .utils import download_cart
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, CatalogCacheMixin,
+                        ReadOnlyModelViewSet):
     """Получение информации об ингредиентах."""
+    catalog = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = _positive_int(request.query_params['limit'], strict=True)
+        except (KeyError, ValueError):
+            limit = None
+        serializer = self.get_serializer(
+            ingredient_index.search(name, limit), many=True)
+        return Response(serializer.data)
+
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ReplicaReadMixin, CatalogCacheMixin, ReadOnlyModelViewSet):
     """Получение информации о тегах."""
+    catalog = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, ModelViewSet):
     """Дейстия с рецептами."""
     queryset = Recipe.objects.all()
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     permission_classes = (IsAuthorOrReadOnly | IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def use_fast_serialization(self):
+        return settings.RECIPE_FAST_SERIALIZATION and self.action == 'list'
+
+    def get_queryset(self):
+        """Рецепты с флагами избранного и корзины и связанными объектами."""
+        queryset = Recipe.objects.all()
+        if not self.use_fast_serialization():
+            queryset = queryset.select_related('author').prefetch_related(
+                'tags',
+                Prefetch(
+                    'recipe',
+                    queryset=IngredientInRecipe.objects.select_related(
+                        'ingredient')
+                ),
+            )
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(FavoriteRecipe.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+            )
+        return queryset
+
+    def get_renderers(self):
+        if not self.use_fast_serialization():
+            return super().get_renderers()
+        return [
+            FastJSONRenderer() if type(renderer) is JSONRenderer else renderer
+            for renderer in super().get_renderers()
+        ]
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов; при RECIPE_FAST_SERIALIZATION без сериализатора."""
+        if not self.use_fast_serialization():
+            return super().list(request, *args, **kwargs)
+        rows = get_recipe_rows(
+            self.filter_queryset(self.get_queryset()), request.user)
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(serialize_recipes(page, request))
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeReadSerializer
         return RecipeEditSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт из кеша с наложением полей текущего пользователя."""
+        try:
+            pk = int(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            raise Http404
+        key = get_recipe_cache_key(pk)
+        data = cache.get(key)
+        if data is None:
+            with read_from_primary():
+                instance = self.get_object()
+                data = self.get_serializer(instance).data
+            data['image'] = instance.image.url if instance.image else None
+            if instance.image_variants_ready:
+                data['image_variants'] = get_variant_urls(instance.image.name)
+            data['is_favorited'] = False
+            data['is_in_shopping_cart'] = False
+            data['author']['is_subscribed'] = False
+            cache.set(key, data, settings.RECIPE_CACHE_TIMEOUT)
+        data = deepcopy(data)
+        if data['image'] is not None:
+            data['image'] = request.build_absolute_uri(data['image'])
+        if data['image_variants'] is not None:
+            data['image_variants'] = {
+                variant: request.build_absolute_uri(url)
+                for variant, url in data['image_variants'].items()
+            }
+        user = request.user
+        if user.is_authenticated:
+            flags = Recipe.objects.filter(pk=pk).values(
+                is_favorited=Exists(FavoriteRecipe.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+                is_subscribed=Exists(Subscribe.objects.filter(
+                    user=user, author=OuterRef('author'))),
+            ).first()
+            if flags is None:
+                cache.delete(key)
+                raise Http404
+            data['is_favorited'] = flags['is_favorited']
+            data['is_in_shopping_cart'] = flags['is_in_shopping_cart']
+            data['author']['is_subscribed'] = flags['is_subscribed']
+        return Response(data)
+
     def add_or_del_object(self, model, pk, serializer, errors):
         recipe = get_object_or_404(Recipe, id=pk)
         serializer = serializer(
@@ -67,6 +188,33 @@ class RecipeViewSet(ModelViewSet):
         object.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def bulk_add_or_del_objects(self, model):
+        """Добавляет или удаляет список рецептов одним запросом к базе.
+
+        Возвращает идентификаторы запрошенных рецептов и ответ
+        со всеми рецептами пользователя в списке после изменения.
+        """
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        objects = model.objects.filter(user=self.request.user)
+        if self.request.method == 'POST':
+            model.objects.bulk_create(
+                (model(user=self.request.user, recipe_id=recipe_id)
+                 for recipe_id in recipe_ids),
+                ignore_conflicts=True,
+            )
+            response_status = status.HTTP_201_CREATED
+        else:
+            # Без сигналов post_delete: счётчики и суммы пересчитываются
+            # одним запросом для всего списка.
+            objects.filter(recipe_id__in=recipe_ids)._raw_delete(objects.db)
+            response_status = status.HTTP_200_OK
+        return recipe_ids, Response(
+            {'recipes': list(objects.values_list('recipe_id', flat=True))},
+            status=response_status,
+        )
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -94,11 +242,95 @@ class RecipeViewSet(ModelViewSet):
         return self.add_or_del_object(
             ShoppingCart, pk, ShopListSerializer, errors)
 
+    @action(
+        detail=False,
+        methods=('POST', 'DELETE'),
+        url_path='favorite',
+        url_name='favorite_bulk',
+        permission_classes=(IsAuthenticated,)
+    )
+    @transaction.atomic
+    def favorite_bulk(self, request):
+        recipe_ids, response = self.bulk_add_or_del_objects(FavoriteRecipe)
+        # Массовые запись и удаление не вызывают сигнал счётчика.
+        refresh_favorites_count(recipe_ids)
+        return response
+
+    @action(
+        detail=False,
+        methods=('POST', 'DELETE'),
+        url_path='shopping_cart',
+        url_name='shopping_cart_bulk',
+        permission_classes=(IsAuthenticated,)
+    )
+    @transaction.atomic
+    def shopping_list_bulk(self, request):
+        recipe_ids, response = self.bulk_add_or_del_objects(ShoppingCart)
+        # Массовые запись и удаление не вызывают сигнал, обновляющий суммы.
+        refresh_cart_totals(
+            [request.user.id],
+            IngredientInRecipe.objects.filter(
+                recipe_id__in=recipe_ids).values_list(
+                'ingredient_id', flat=True)
+        )
+        return response
+
+    @action(
+        detail=False,
+        url_path='feed',
+        url_name='feed',
+        permission_classes=(IsAuthenticated,),
+        pagination_class=CustomPagination,
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок, новые сверху."""
+        page = self.paginate_queryset(get_feed(request.user))
+        recipes = self.get_queryset().in_bulk(
+            [item['recipe_id'] for item in page])
+        serializer = RecipeReadSerializer(
+            [recipes[item['recipe_id']] for item in page
+             if item['recipe_id'] in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        url_path='cookable',
+        url_name='cookable',
+        pagination_class=CustomPagination,
+    )
+    def cookable(self, request):
+        """Рецепты, которые можно приготовить из указанных ингредиентов."""
+        try:
+            ingredient_ids = [
+                int(ingredient_id)
+                for value in request.query_params.getlist('ingredients')
+                for ingredient_id in value.split(',') if ingredient_id
+            ]
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'Укажите id ингредиентов через запятую'})
+        full = request.query_params.get('full') in ('1', 'true')
+        page = self.paginate_queryset(
+            recipe_ingredient_index.search(ingredient_ids, full))
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in page])
+        serializer = RecipeReadSerializer(
+            [recipes[recipe_id] for recipe_id, _ in page
+             if recipe_id in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=False,
         url_path='download_shopping_cart',
         url_name='download_shopping_cart',
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(PlainTextRenderer, CSVRenderer, JSONRenderer),
     )
     def download_shopping_cart(self, request):
         return download_cart(request)
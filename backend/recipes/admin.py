@@ -1,10 +1,9 @@
 from django.contrib import admin
 from django.contrib.admin import display
 from django.core import exceptions
-from django.db.models import Count
 
 from .models import (FavoriteRecipe, Ingredient, IngredientInRecipe, Recipe,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingCartIngredient, Tag)
 
 
 @admin.register(Recipe)
@@ -23,7 +22,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @display(description='Количество в избранных')
     def added_in_favorites(self, obj):
-        return obj.obj_count
+        return obj.favorites_count
 
     @display(description='Ингредиенты')
     def ingredients_list(self, obj):
@@ -34,16 +33,8 @@ class RecipeAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        return queryset.annotate(
-            obj_count=Count(
-                "favoriterecipe",
-                distinct=True
-            ),
-            ingredients_list=Count(
-                "ingredients",
-                distinct=True
-            ),
-        )
+        return queryset.select_related('author').prefetch_related(
+            'ingredients')
 
     def save_model(self, request, obj, form, change):
         if not obj.tags.exists():
@@ -87,6 +78,15 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+@admin.register(ShoppingCartIngredient)
+class ShoppingCartIngredientAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'user', 'ingredient', 'total_amount'
+    )
+    list_filter = ('user',)
+    empty_value_display = '-пусто-'
+
+
 @admin.register(FavoriteRecipe)
 class FavoriteRecipeAdmin(admin.ModelAdmin):
     list_display = (
@@ -5,3 +5,17 @@ class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import signals  # noqa: F401
+        from .search import create_ingredient_name_index, create_search_index
+        from .utils import (backfill_cart_totals, backfill_counters,
+                            backfill_feeds, backfill_tag_masks)
+        post_migrate.connect(create_search_index, sender=self)
+        post_migrate.connect(create_ingredient_name_index, sender=self)
+        post_migrate.connect(backfill_cart_totals, sender=self)
+        post_migrate.connect(backfill_tag_masks, sender=self)
+        post_migrate.connect(backfill_counters, sender=self)
+        post_migrate.connect(backfill_feeds, sender=self)
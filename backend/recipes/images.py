@@ -0,0 +1,77 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image
+
+from .models import Recipe
+from .utils import invalidate_recipe_cache
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (640, 640),
+    'webp': None,
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS,
+    thread_name_prefix='recipe-images',
+)
+
+
+def get_variant_name(name, variant):
+    """Имя файла уменьшенной копии изображения в формате WebP."""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'variants', f'{stem}_{variant}.webp')
+
+
+def get_variant_urls(name):
+    return {
+        variant: default_storage.url(get_variant_name(name, variant))
+        for variant in IMAGE_VARIANTS
+    }
+
+
+def create_variants(name):
+    """Создаёт недостающие копии изображения и отмечает рецепты."""
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    for variant, size in IMAGE_VARIANTS.items():
+        variant_name = get_variant_name(name, variant)
+        if default_storage.exists(variant_name):
+            continue
+        copy = image.copy()
+        if size is not None:
+            copy.thumbnail(size)
+        buffer = BytesIO()
+        copy.save(buffer, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY)
+        default_storage.save(variant_name, ContentFile(buffer.getvalue()))
+    recipes = Recipe.objects.filter(image=name)
+    recipe_ids = list(recipes.values_list('id', flat=True))
+    recipes.update(image_variants_ready=True)
+    invalidate_recipe_cache(recipe_ids)
+
+
+def process_image(name):
+    try:
+        create_variants(name)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+    finally:
+        connection.close()
+
+
+def schedule_variants(name):
+    """Ставит обработку изображения в очередь после фиксации транзакции."""
+    transaction.on_commit(lambda: executor.submit(process_image, name))
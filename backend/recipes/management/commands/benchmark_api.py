@@ -0,0 +1,195 @@
+import json
+import math
+from time import perf_counter
+
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from rest_framework.test import APIClient
+from users.models import User
+
+# Запросы с изменениями выполняются парами, чтобы данные не менялись.
+ENDPOINTS = (
+    ('recipes', ('get',), '/api/recipes/'),
+    ('recipes-cursor', ('get',), '/api/recipes/?pagination=cursor'),
+    ('recipes-tags', ('get',), '/api/recipes/?tags={tag}'),
+    ('recipes-author', ('get',), '/api/recipes/?author={author}'),
+    ('recipes-favorited', ('get',), '/api/recipes/?is_favorited=1'),
+    ('recipes-in-cart', ('get',), '/api/recipes/?is_in_shopping_cart=1'),
+    ('recipes-search', ('get',), '/api/recipes/?search={word}'),
+    ('recipe', ('get',), '/api/recipes/{recipe}/'),
+    ('feed', ('get',), '/api/recipes/feed/'),
+    ('cookable', ('get',), '/api/recipes/cookable/?ingredients={ingredients}'),
+    ('download-cart', ('get',), '/api/recipes/download_shopping_cart/'),
+    ('favorite', ('post', 'delete'), '/api/recipes/{recipe}/favorite/'),
+    ('shopping-cart', ('post', 'delete'),
+     '/api/recipes/{recipe}/shopping_cart/'),
+    ('tags', ('get',), '/api/tags/'),
+    ('ingredients', ('get',), '/api/ingredients/'),
+    ('ingredients-name', ('get',), '/api/ingredients/?name={prefix}'),
+    ('users', ('get',), '/api/users/'),
+    ('user', ('get',), '/api/users/{author}/'),
+    ('me', ('get',), '/api/users/me/'),
+    ('subscriptions', ('get',), '/api/users/subscriptions/?recipes_limit=3'),
+    ('subscribe', ('post', 'delete'), '/api/users/{author}/subscribe/'),
+)
+
+DEFAULT_BUDGET = {'p95': 500, 'queries': 15}
+
+BENCHMARK_SETTINGS = {
+    'ALLOWED_HOSTS': ['*'],
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'benchmark',
+        },
+    },
+}
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+def get_dataset_size(recipes):
+    """Объёмы данных для заданного числа рецептов."""
+    users = max(recipes // 10, 10)
+    return {
+        'users': users,
+        'recipes': recipes,
+        'favorites': recipes * 5,
+        'carts': users * 3,
+        'subscriptions': users * 5,
+    }
+
+
+def get_context(user):
+    """Значения для подстановки в адреса эндпоинтов."""
+    recipe = Recipe.objects.exclude(
+        favoriterecipe__user=user).exclude(shoppingcart__user=user).first()
+    author = User.objects.exclude(
+        following__user=user).exclude(pk=user.pk).order_by(
+        '-recipes_count').first()
+    ingredients = IngredientInRecipe.objects.filter(
+        recipe__author=author).values_list('ingredient_id', flat=True)[:10]
+    ingredient = Ingredient.objects.first()
+    return {
+        'recipe': recipe.id,
+        'author': author.id,
+        'tag': Recipe.tags.through.objects.values_list(
+            'tag__slug', flat=True).first(),
+        'word': recipe.name.split()[0],
+        'ingredients': ','.join(map(str, set(ingredients))),
+        'prefix': ingredient.name[:2],
+    }
+
+
+class Command(BaseCommand):
+    help = ('Замер задержек и количества запросов эндпоинтов API '
+            'на синтетических данных разного объёма')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='100,1000',
+            help='Количество рецептов для каждого замера через запятую',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Количество повторов каждого запроса',
+        )
+        parser.add_argument(
+            '--budget',
+            help='JSON-файл с бюджетами вида '
+                 '{"recipes": {"p95": 200, "queries": 6}}; '
+                 'ключ "default" задаёт бюджет остальных эндпоинтов',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        budgets = {'default': DEFAULT_BUDGET}
+        if options['budget']:
+            with open(options['budget'], encoding='utf-8') as file:
+                budgets.update(json.load(file))
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(**BENCHMARK_SETTINGS):
+                failures = self.run_benchmarks(sizes, budgets, options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+        if failures:
+            raise CommandError(
+                'Превышен бюджет:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Бюджеты соблюдены.'))
+
+    def run_benchmarks(self, sizes, budgets, options):
+        call_command('load_tags', stdout=self.stdout)
+        call_command('load_ingrs', stdout=self.stdout)
+        failures = []
+        seeded = dict.fromkeys(get_dataset_size(0), 0)
+        for size in sizes:
+            target = get_dataset_size(size)
+            call_command(
+                'seed_synthetic',
+                seed=options['seed'] + size,
+                stdout=self.stdout,
+                **{key: target[key] - seeded[key] for key in target},
+            )
+            seeded = target
+            user = User.objects.filter(
+                shoppingcart__isnull=False,
+            ).order_by('-following_count', 'id').first()
+            context = get_context(user)
+            client = APIClient()
+            client.force_authenticate(user)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'Рецептов: {size}'))
+            self.stdout.write(
+                f'{"эндпоинт":<28}{"p50, мс":>10}{"p95, мс":>10}'
+                f'{"запросов":>10}')
+            for name, methods, url in ENDPOINTS:
+                url = url.format(**context)
+                timings = {method: [] for method in methods}
+                queries = dict.fromkeys(methods, 0)
+                for _ in range(options['repeat']):
+                    for method in methods:
+                        connection.queries_log.clear()
+                        with CaptureQueriesContext(connection) as captured:
+                            start = perf_counter()
+                            response = getattr(client, method)(url)
+                            if getattr(response, 'streaming', False):
+                                b''.join(response.streaming_content)
+                            timings[method].append(perf_counter() - start)
+                        if response.status_code >= 400:
+                            raise CommandError(
+                                f'{method.upper()} {url}: '
+                                f'{response.status_code}')
+                        queries[method] = max(
+                            queries[method], len(captured.captured_queries))
+                for method in methods:
+                    label = name if len(methods) == 1 else f'{name}.{method}'
+                    p50 = percentile(timings[method], 50) * 1000
+                    p95 = percentile(timings[method], 95) * 1000
+                    self.stdout.write(
+                        f'{label:<28}{p50:>10.1f}{p95:>10.1f}'
+                        f'{queries[method]:>10}')
+                    budget = budgets.get(label) or budgets.get(
+                        name, budgets['default'])
+                    if p95 > budget.get('p95', math.inf):
+                        failures.append(
+                            f'{size} рецептов, {label}: p95 {p95:.1f} мс '
+                            f'> {budget["p95"]} мс')
+                    if queries[method] > budget.get('queries', math.inf):
+                        failures.append(
+                            f'{size} рецептов, {label}: {queries[method]} '
+                            f'запросов > {budget["queries"]}')
+        return failures
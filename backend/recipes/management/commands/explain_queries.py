@@ -0,0 +1,125 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from recipes.models import (FavoriteRecipe, FeedItem, Ingredient,
+                            IngredientInRecipe, Recipe, ShoppingCart, Tag)
+from rest_framework.test import APIClient
+from users.models import Subscribe, User
+
+# Отключаем кеш, чтобы запросы доходили до базы.
+EXPLAIN_SETTINGS = {
+    'ALLOWED_HOSTS': ['*'],
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    },
+}
+
+FULL_SCAN_MARKERS = {
+    'postgresql': ('Seq Scan on ',),
+    'sqlite': ('SCAN ',),
+}
+
+HOT_TABLES = tuple(model._meta.db_table for model in (
+    Recipe, FavoriteRecipe, ShoppingCart, IngredientInRecipe, FeedItem,
+    Subscribe,
+))
+
+
+def get_endpoints(user):
+    """GET-запросы эндпоинтов, планы которых нужно проверять."""
+    recipe = Recipe.objects.order_by('-pub_date').first()
+    tag = Tag.objects.first()
+    ingredient = Ingredient.objects.first()
+    endpoints = [
+        '/api/recipes/',
+        '/api/recipes/?pagination=cursor',
+        f'/api/recipes/?author={user.id}',
+        '/api/recipes/?is_favorited=1',
+        '/api/recipes/?is_in_shopping_cart=1',
+        '/api/recipes/feed/',
+        '/api/recipes/download_shopping_cart/',
+        '/api/users/',
+        '/api/users/me/',
+        '/api/users/subscriptions/',
+        '/api/tags/',
+        '/api/ingredients/',
+    ]
+    if recipe is not None:
+        endpoints.append(f'/api/recipes/{recipe.id}/')
+    if tag is not None:
+        endpoints.append(f'/api/recipes/?tags={tag.slug}')
+    if ingredient is not None:
+        endpoints.append(
+            f'/api/recipes/cookable/?ingredients={ingredient.id}')
+        endpoints.append(
+            f'/api/ingredients/?name={ingredient.name[:2]}')
+    return endpoints
+
+
+def explain(sql):
+    prefix = (
+        'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        return '\n'.join(
+            ' '.join(str(column) for column in row)
+            for row in cursor.fetchall()
+        )
+
+
+class Command(BaseCommand):
+    help = 'Вывод планов (EXPLAIN) SQL-запросов основных эндпоинтов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Имя пользователя, от которого выполняются запросы.',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Завершиться с ошибкой при полном сканировании '
+                 'нагруженных таблиц.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Нет пользователя для выполнения запросов.')
+        client = APIClient()
+        client.force_authenticate(user)
+        markers = FULL_SCAN_MARKERS.get(connection.vendor, ())
+        problems = []
+        with override_settings(**EXPLAIN_SETTINGS):
+            for url in get_endpoints(user):
+                with CaptureQueriesContext(connection) as context:
+                    response = client.get(url)
+                    if getattr(response, 'streaming', False):
+                        b''.join(response.streaming_content)
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'{url} [{response.status_code}] '
+                    f'запросов: {len(context.captured_queries)}'))
+                for query in context.captured_queries:
+                    sql = query['sql']
+                    if not sql.lstrip().upper().startswith(
+                            ('SELECT', 'WITH')):
+                        continue
+                    plan = explain(sql)
+                    self.stdout.write(sql)
+                    self.stdout.write(plan + '\n')
+                    problems.extend(
+                        f'{url}: {line.strip()}'
+                        for line in plan.splitlines()
+                        if any(marker in line for marker in markers)
+                        and 'INDEX' not in line
+                        and any(table in line for table in HOT_TABLES)
+                    )
+        if options['check'] and problems:
+            raise CommandError(
+                'Полное сканирование таблиц:\n' + '\n'.join(problems))
@@ -0,0 +1,208 @@
+import csv
+import json
+import time
+from collections import Counter
+from itertools import islice
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes.search import update_search_index
+from recipes.utils import (bump_catalog_version_on_commit, fan_out_recipes,
+                           refresh_tag_masks)
+from users.models import User
+
+
+def read_ndjson(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def parse_ndjson(line):
+    row = json.loads(line)
+    if not isinstance(row, dict):
+        raise ValueError('запись должна быть объектом')
+    return row
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+def parse_csv(row):
+    """Строка CSV с тегами вида 1;2 и ингредиентами вида id:amount;..."""
+    ingredients = []
+    for item in (row.get('ingredients') or '').split(';'):
+        if item:
+            ingredient_id, amount = item.split(':')
+            ingredients.append({'id': ingredient_id, 'amount': amount})
+    return {
+        **row,
+        'tags': [tag for tag in (row.get('tags') or '').split(';') if tag],
+        'ingredients': ingredients,
+    }
+
+
+def normalize(row):
+    """Приводит значения записи к типам модели.
+
+    Некорректные значения вызывают KeyError, TypeError или ValueError.
+    """
+    return {
+        'author': int(row['author']),
+        'name': str(row.get('name') or ''),
+        'text': str(row.get('text') or ''),
+        'image': str(row.get('image') or ''),
+        'cooking_time': int(row.get('cooking_time') or 0),
+        'tags': [int(tag) for tag in row.get('tags') or ()],
+        'ingredients': [
+            {'id': int(item['id']), 'amount': int(item['amount'])}
+            for item in row.get('ingredients') or ()
+        ],
+    }
+
+
+READERS = {
+    'ndjson': (read_ndjson, parse_ndjson),
+    'csv': (read_csv, parse_csv),
+}
+
+
+class Command(BaseCommand):
+    help = 'Массовый импорт рецептов из NDJSON или CSV файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу с рецептами')
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество рецептов в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пачки должен быть больше нуля')
+        self.user_ids = set(User.objects.values_list('id', flat=True))
+        self.tag_ids = set(Tag.objects.values_list('id', flat=True))
+        self.ingredient_ids = set(
+            Ingredient.objects.values_list('id', flat=True))
+        imported = rejected = 0
+        started = time.monotonic()
+        read, parse = READERS[file_format]
+        with open(path, 'r', encoding='utf-8') as file:
+            rows = enumerate(read(file), start=1)
+            while True:
+                chunk = list(islice(rows, batch_size))
+                if not chunk:
+                    break
+                batch = []
+                for number, raw in chunk:
+                    try:
+                        row = normalize(parse(raw))
+                    except (KeyError, TypeError, ValueError) as error:
+                        rejected += 1
+                        self.stderr.write(
+                            f'Запись {number}: некорректные данные ({error})')
+                        continue
+                    error = self.validate(row)
+                    if error:
+                        rejected += 1
+                        self.stderr.write(f'Запись {number}: {error}')
+                    else:
+                        batch.append(row)
+                if not batch:
+                    continue
+                self.import_batch(batch)
+                imported += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Импортировано {imported} рецептов, '
+                    f'{imported / elapsed:.0f} рецептов/с'
+                )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершён: {imported} рецептов, отклонено {rejected}, '
+            f'{elapsed:.1f} с ({imported / max(elapsed, 1e-9):.0f} '
+            f'рецептов/с)'
+        ))
+
+    def validate(self, row):
+        name = row['name']
+        if len(name) < 4 or not name.isalpha():
+            return 'Должно быть мин. 4 знака и мин. 1 буква.'
+        if row['author'] not in self.user_ids:
+            return 'Указан несуществующий автор'
+        if not row['image']:
+            return 'Укажите изображение'
+        ingredients = row['ingredients']
+        if not ingredients:
+            return 'Укажите хотя бы один ингредиент'
+        ing_ids = [ingredient['id'] for ingredient in ingredients]
+        if (len(ing_ids) != len(set(ing_ids))
+                or not self.ingredient_ids.issuperset(ing_ids)):
+            return 'Указаны некорректные ингредиенты'
+        tags = row['tags']
+        if (not tags or len(tags) != len(set(tags))
+                or not self.tag_ids.issuperset(tags)):
+            return 'Укажите хотя бы один уникальный тег'
+        if any(item['amount'] < 1 for item in ingredients):
+            return 'Количество ингредиента не может быть меньше 1'
+        if not 1 <= row['cooking_time'] <= 300:
+            return 'Укажите время от 1 до 300 минут'
+        return None
+
+    @transaction.atomic
+    def import_batch(self, batch):
+        recipes = [
+            Recipe(
+                author_id=row['author'],
+                name=row['name'],
+                text=row['text'],
+                image=row['image'],
+                cooking_time=row['cooking_time'],
+            )
+            for row in batch
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+        else:
+            for recipe in recipes:
+                recipe.save()
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+            for recipe, row in zip(recipes, batch)
+            for tag_id in row['tags']
+        )
+        refresh_tag_masks(recipe.id for recipe in recipes)
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient['id'],
+                amount=ingredient['amount'],
+            )
+            for recipe, row in zip(recipes, batch)
+            for ingredient in row['ingredients']
+        )
+        if connection.features.can_return_rows_from_bulk_insert:
+            # bulk_create не вызывает сигналы, поэтому счётчики авторов,
+            # ленты подписчиков и поисковые индексы обновляются здесь.
+            authors = Counter(recipe.author_id for recipe in recipes)
+            for author_id, count in authors.items():
+                User.objects.filter(pk=author_id).update(
+                    recipes_count=F('recipes_count') + count)
+            fan_out_recipes(recipes)
+            update_search_index(recipe.id for recipe in recipes)
+            bump_catalog_version_on_commit('recipes')
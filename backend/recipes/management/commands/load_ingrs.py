@@ -1,21 +1,173 @@
 import csv
+import io
+import json
+import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 from recipes.models import Ingredient
+from recipes.utils import bump_catalog_version
+
+FIELDS = ('name', 'measurement_unit')
+TABLE = Ingredient._meta.db_table
+STAGING_TABLE = f'{TABLE}_staging'
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+def read_json(file, chunk_size=64 * 1024):
+    """Объекты из JSON-массива или NDJSON без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n[],':
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = file.read(chunk_size), 0
+            eof = not buffer
+            continue
+        try:
+            row, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        position = end
+        yield row
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
 
 
 class Command(BaseCommand):
-    help = 'Загрузка списка из csv файла'
-
-    def handle(self, *args, **kwargs):
-        data_path = settings.BASE_DIR
-        with open(
-            f'{data_path}/data/ingredients.csv',
-            'r',
-            encoding='utf-8'
-        ) as file:
-            reader = csv.DictReader(file)
+    help = 'Загрузка списка ингредиентов из csv или json файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+            help='Путь к файлу, по умолчанию data/ingredients.csv',
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк в одной пачке',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY в PostgreSQL',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'json' if path.endswith('.json') else 'csv')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пачки должен быть больше нуля')
+        use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy'])
+        self.processed = self.rejected = 0
+        self.started = time.monotonic()
+        with open(path, 'r', encoding='utf-8') as file:
+            rows = self.clean(READERS[file_format](file))
+            if use_copy:
+                created = self.load_with_copy(rows, batch_size)
+            else:
+                created = self.load_with_bulk_create(rows, batch_size)
+        bump_catalog_version('ingredients')
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'База ингридиентов загружена: обработано {self.processed}, '
+            f'добавлено {created}, отклонено {self.rejected}, '
+            f'{elapsed:.1f} с ({self.processed / max(elapsed, 1e-9):.0f} '
+            f'строк/с)'
+        ))
+
+    def clean(self, rows):
+        for number, row in enumerate(rows, start=1):
+            values = tuple(str(row.get(field) or '').strip()
+                           for field in FIELDS)
+            if not all(values) or any(
+                    len(value) > settings.MAX_LEN for value in values):
+                self.rejected += 1
+                self.stderr.write(f'Строка {number}: некорректные данные')
+                continue
+            yield values
+
+    def report(self, count):
+        self.processed += count
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'Обработано {self.processed} строк, '
+            f'{self.processed / max(elapsed, 1e-9):.0f} строк/с')
+
+    def batches(self, rows, batch_size):
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+            self.report(len(batch))
+
+    def load_with_bulk_create(self, rows, batch_size):
+        before = Ingredient.objects.count()
+        for batch in self.batches(rows, batch_size):
             Ingredient.objects.bulk_create(
-                Ingredient(**data) for data in reader)
-        self.stdout.write(self.style.SUCCESS('База ингридиентов загружена!'))
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in batch),
+                ignore_conflicts=True,
+            )
+        return Ingredient.objects.count() - before
+
+    @transaction.atomic
+    def load_with_copy(self, rows, batch_size):
+        """COPY во временную таблицу и слияние одним INSERT.
+
+        Существующие пары (name, measurement_unit) пропускаются,
+        поэтому повторный запуск ничего не меняет.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE {STAGING_TABLE} '
+                f'(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            for batch in self.batches(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                    f'FROM STDIN WITH (FORMAT csv)',
+                    buffer,
+                )
+            cursor.execute(
+                f'INSERT INTO {TABLE} (name, measurement_unit) '
+                f'SELECT DISTINCT name, measurement_unit '
+                f'FROM {STAGING_TABLE} '
+                f'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            return cursor.rowcount
@@ -1,5 +1,6 @@
 from django.core.management import BaseCommand
 from recipes.models import Tag
+from recipes.utils import bump_catalog_version
 
 
 class Command(BaseCommand):
@@ -10,5 +11,8 @@ class Command(BaseCommand):
             {'name': 'Завтрак', 'color': '#E26C2D', 'slug': 'breakfast'},
             {'name': 'Обед', 'color': '#49B64E', 'slug': 'dinner'},
             {'name': 'Ужин', 'color': '#8775D2', 'slug': 'supper'}]
-        Tag.objects.bulk_create(Tag(**tag) for tag in data)
+        tags = [Tag(**tag) for tag in data]
+        Tag.assign_bits(tags)
+        Tag.objects.bulk_create(tags)
+        bump_catalog_version('tags')
         self.stdout.write(self.style.SUCCESS('Тэги загружены!'))
@@ -0,0 +1,23 @@
+from django.core.management import BaseCommand
+from recipes.images import create_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создание недостающих копий изображений рецептов'
+
+    def handle(self, *args, **kwargs):
+        names = Recipe.objects.filter(
+            image_variants_ready=False
+        ).exclude(image='').order_by().values_list(
+            'image', flat=True).distinct()
+        processed = 0
+        for name in names.iterator():
+            try:
+                create_variants(name)
+            except OSError as error:
+                self.stderr.write(f'{name}: {error}')
+                continue
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}'))
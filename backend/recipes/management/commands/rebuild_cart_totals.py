@@ -0,0 +1,42 @@
+from django.core.management import BaseCommand, CommandError
+from recipes.models import ShoppingCartIngredient
+from recipes.utils import get_cart_totals, refresh_cart_totals
+
+
+class Command(BaseCommand):
+    help = 'Пересборка и проверка сумм в списках покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сравнить таблицу с живыми данными',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            refresh_cart_totals()
+        stored = {
+            (row['user_id'], row['ingredient_id']): row['total_amount']
+            for row in ShoppingCartIngredient.objects.values(
+                'user_id', 'ingredient_id', 'total_amount')
+        }
+        live = {
+            (row['user_id'], row['ingredient_id']): row['total_amount']
+            for row in get_cart_totals()
+            if row['ingredient_id'] is not None
+        }
+        mismatches = [
+            key for key in stored.keys() | live.keys()
+            if stored.get(key) != live.get(key)
+        ]
+        for user_id, ingredient_id in sorted(mismatches):
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'в таблице {stored.get((user_id, ingredient_id))}, '
+                f'должно быть {live.get((user_id, ingredient_id))}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Суммы в списках покупок согласованы ({len(live)} строк).'))
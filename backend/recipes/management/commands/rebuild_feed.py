@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from recipes.models import FeedItem
+from recipes.utils import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Пересборка лент подписок'
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        rebuild_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны: {FeedItem.objects.count()} записей.'))
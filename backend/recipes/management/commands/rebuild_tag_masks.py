@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from recipes.utils import (assign_missing_tag_bits,
+                           bump_catalog_version_on_commit, refresh_tag_masks)
+
+
+class Command(BaseCommand):
+    help = 'Назначение битов тегам и пересчёт масок тегов рецептов'
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        tags = assign_missing_tag_bits()
+        refresh_tag_masks()
+        bump_catalog_version_on_commit('tags')
+        self.stdout.write(self.style.SUCCESS(
+            f'Маски тегов пересчитаны, новых битов: {len(tags)}.'))
@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from recipes.utils import get_counters, repair_counter
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного, рецептов и подписок'
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        for model, counter, queryset, field in get_counters():
+            repaired = repair_counter(model, counter, queryset, field)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}.{counter}: '
+                f'исправлено {repaired}'
+            )
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
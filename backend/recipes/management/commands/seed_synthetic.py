@@ -0,0 +1,166 @@
+import random
+import secrets
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection, transaction
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, Tag)
+from recipes.search import update_search_index
+from recipes.utils import bump_catalog_version_on_commit, refresh_tag_masks
+from users.models import Subscribe, User
+
+SYNTHETIC_IMAGE = 'recipes/images/synthetic.png'
+SYNTHETIC_PASSWORD = 'synthetic'
+BATCH_SIZE = 1000
+
+
+class SkewedChoice:
+    """Выбор элементов с популярностью по закону Ципфа."""
+
+    def __init__(self, rng, items, skew):
+        self.rng = rng
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(
+            1 / (rank + 1) ** skew for rank in range(len(self.items))
+        ))
+
+    def __call__(self, k=1):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+
+def pairs(rng, users, choose, total, exclude_self=False):
+    """Уникальные пары (пользователь, объект) в количестве до total."""
+    result = set()
+    for _ in range(total * 2):
+        if len(result) >= total:
+            break
+        user = rng.choice(users)
+        target = choose()[0]
+        if not exclude_self or user != target:
+            result.add((user, target))
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Генерация синтетических пользователей, рецептов и связей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--favorites', type=int, default=5000)
+        parser.add_argument('--carts', type=int, default=300)
+        parser.add_argument('--subscriptions', type=int, default=500)
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='Показатель закона Ципфа для популярности авторов, '
+                 'рецептов и ингредиентов',
+        )
+        parser.add_argument('--seed', type=int, help='Зерно генератора')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not tag_ids or not ingredient_ids:
+            raise CommandError(
+                'Сначала загрузите справочники: load_tags и load_ingrs.')
+        users = self.create_users(options['users'])
+        user_ids = list(User.objects.values_list('id', flat=True))
+        skew = options['skew']
+        authors = SkewedChoice(rng, user_ids, skew)
+        ingredients = SkewedChoice(rng, ingredient_ids, skew)
+        recipe_ids = self.create_recipes(
+            rng, options['recipes'], authors, ingredients, tag_ids)
+        recipes = SkewedChoice(
+            rng, Recipe.objects.values_list('id', flat=True), skew)
+        new_user_ids = [user.id for user in users] or user_ids
+        for model, total in ((FavoriteRecipe, options['favorites']),
+                             (ShoppingCart, options['carts'])):
+            model.objects.bulk_create(
+                (model(user_id=user_id, recipe_id=recipe_id)
+                 for user_id, recipe_id in pairs(
+                     rng, new_user_ids, recipes, total)),
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        Subscribe.objects.bulk_create(
+            (Subscribe(user_id=user_id, author_id=author_id)
+             for user_id, author_id in pairs(
+                 rng, new_user_ids, authors, options['subscriptions'],
+                 exclude_self=True)),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        # bulk_create не вызывает сигналы: производные данные
+        # пересчитываются целиком.
+        refresh_tag_masks(recipe_ids)
+        update_search_index()
+        for command in ('repair_counters', 'rebuild_cart_totals',
+                        'rebuild_feed'):
+            call_command(command, stdout=self.stdout)
+        bump_catalog_version_on_commit('recipes')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, '
+            f'рецептов: {len(recipe_ids)}.'))
+
+    def create_users(self, total):
+        prefix = f'synthetic-{secrets.token_hex(3)}'
+        password = make_password(SYNTHETIC_PASSWORD)
+        users = [
+            User(
+                username=f'{prefix}-{index}',
+                email=f'{prefix}-{index}@example.com',
+                first_name='Пользователь',
+                last_name=str(index),
+                password=password,
+            )
+            for index in range(total)
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            return User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        return list(User.objects.filter(username__startswith=prefix))
+
+    def create_recipes(self, rng, total, authors, ingredients, tag_ids):
+        recipe_ids = []
+        for start in range(0, total, BATCH_SIZE):
+            size = min(BATCH_SIZE, total - start)
+            recipes = [
+                Recipe(
+                    author_id=author_id,
+                    name=f'Рецепт {start + index}',
+                    text='Синтетический рецепт.',
+                    image=SYNTHETIC_IMAGE,
+                    cooking_time=rng.randint(5, 180),
+                )
+                for index, author_id in enumerate(authors(size))
+            ]
+            if connection.features.can_return_rows_from_bulk_insert:
+                Recipe.objects.bulk_create(recipes)
+            else:
+                for recipe in recipes:
+                    recipe.save()
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+                for recipe in recipes
+                for tag_id in rng.sample(
+                    tag_ids, rng.randint(1, min(3, len(tag_ids))))
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe_id=recipe.id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient_id in set(ingredients(
+                    min(max(int(rng.gauss(8, 3)), 2), 20)))
+            )
+            recipe_ids.extend(recipe.id for recipe in recipes)
+        return recipe_ids
@@ -1,9 +1,14 @@
 from colorfield.fields import ColorField
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from users.models import User
 
+MAX_TAGS = 63
+
+RECIPE_COUNTER_FIELDS = ('favorites_count', 'tags_mask')
+
 
 class Tag(models.Model):
     name = models.CharField(
@@ -24,6 +29,12 @@ class Tag(models.Model):
         max_length=settings.MAX_LEN,
         unique=True,
     )
+    bit = models.PositiveSmallIntegerField(
+        verbose_name='Бит в маске тегов',
+        unique=True,
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -33,6 +44,24 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            Tag.assign_bits([self])
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def assign_bits(cls, tags):
+        """Назначает тегам свободные биты маски Recipe.tags_mask."""
+        used = set(cls.objects.exclude(bit=None).values_list('bit', flat=True))
+        used.update(tag.bit for tag in tags if tag.bit is not None)
+        free = (bit for bit in range(MAX_TAGS) if bit not in used)
+        for tag in tags:
+            if tag.bit is None:
+                tag.bit = next(free, None)
+                if tag.bit is None:
+                    raise ValidationError(
+                        f'Нельзя создать больше {MAX_TAGS} тегов.')
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -75,6 +104,11 @@ class Recipe(models.Model):
         verbose_name='Изображение',
         upload_to='recipes/images',
     )
+    image_variants_ready = models.BooleanField(
+        verbose_name='Копии изображения готовы',
+        default=False,
+        editable=False,
+    )
     cooking_time = models.PositiveIntegerField(
         verbose_name='Время приготовления',
         default=1,
@@ -96,15 +130,50 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации рецепта',
         auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Количество в избранных',
+        default=0,
+        editable=False,
+    )
+    tags_mask = models.BigIntegerField(
+        verbose_name='Маска тегов',
+        default=0,
+        db_index=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id'),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_id'),
+        ]
 
     def __str__(self):
         return f'Автор: {self.author.username} рецепт: {self.name}'
 
+    def save(self, *args, **kwargs):
+        # Счётчик избранного и маска тегов меняются только UPDATE-запросами.
+        # Из переданного update_fields они тоже исключаются.
+        if not self._state.adding:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key
+                ]
+            kwargs['update_fields'] = [
+                name for name in update_fields
+                if name not in RECIPE_COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class IngredientInRecipe(models.Model):
     recipe = models.ForeignKey(
@@ -170,6 +239,11 @@ class FavoriteRecipe(CustomRecipeModel):
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
                 name='unique_favourite')]
+        indexes = [
+            models.Index(
+                fields=('recipe', 'user'),
+                name='favorite_recipe_user'),
+        ]
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранные'
 
@@ -186,6 +260,84 @@ class ShoppingCart(CustomRecipeModel):
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
                 name='unique_user_recipe_cart')]
+        indexes = [
+            models.Index(
+                fields=('recipe', 'user'),
+                name='cart_recipe_user'),
+        ]
 
     def __str__(self):
         return f'{self.user} добавил "{self.recipe}" в Корзину покупок'
+
+
+class ShoppingCartIngredient(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        verbose_name='Ингредиент',
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество',
+    )
+
+    class Meta:
+        ordering = ('ingredient',)
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_user_cart_ingredient')]
+
+    def __str__(self):
+        return (
+            f'{self.user}: {self.ingredient.name} {self.total_amount} '
+            f'({self.ingredient.measurement_unit})'
+        )
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта',
+    )
+
+    class Meta:
+        ordering = ('-pub_date', '-recipe')
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_item')]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date'),
+                name='feed_item_user_pub_date')]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Ingredient, Recipe
+
+TABLE = Recipe._meta.db_table
+FTS_TABLE = f'{TABLE}_fts'
+INGREDIENT_TABLE = Ingredient._meta.db_table
+
+
+def create_search_index(**kwargs):
+    """Создаёт поисковый индекс рецептов и заполняет недостающие записи.
+
+    В PostgreSQL это колонка tsvector с GIN-индексом, в SQLite —
+    виртуальная таблица FTS5. На других СУБД поиск не поддерживается.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'ALTER TABLE {TABLE} '
+                f'ADD COLUMN IF NOT EXISTS search_vector tsvector'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {TABLE}_search_vector '
+                f'ON {TABLE} USING gin (search_vector)'
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                f'USING fts5(name, text, tokenize="unicode61")'
+            )
+        else:
+            return
+    update_search_index()
+
+
+def create_ingredient_name_index(**kwargs):
+    """Создаёт функциональный индекс lower(name) для поиска по префиксу.
+
+    В PostgreSQL индекс строится с text_pattern_ops, чтобы LIKE 'abc%'
+    использовал его при любой сортировке базы.
+    """
+    if connection.vendor == 'postgresql':
+        expression = 'lower(name) text_pattern_ops'
+    elif connection.vendor == 'sqlite':
+        expression = 'lower(name)'
+    else:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INGREDIENT_TABLE}_name_lower '
+            f'ON {INGREDIENT_TABLE} ({expression})'
+        )
+
+
+def update_search_index(recipe_ids=None):
+    """Обновляет поисковый индекс для рецептов (None — недостающие)."""
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            where = (
+                'search_vector IS NULL' if recipe_ids is None
+                else f'id IN ({placeholders})'
+            )
+            cursor.execute(
+                f'UPDATE {TABLE} SET search_vector = '
+                f'setweight(to_tsvector(%s, name), \'A\') || '
+                f'setweight(to_tsvector(%s, text), \'B\') '
+                f'WHERE {where}',
+                [settings.SEARCH_CONFIG] * 2 + (recipe_ids or []),
+            )
+        elif connection.vendor == 'sqlite':
+            if recipe_ids is None:
+                where = f'id NOT IN (SELECT rowid FROM {FTS_TABLE})'
+            else:
+                where = f'id IN ({placeholders})'
+                cursor.execute(
+                    f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                    recipe_ids,
+                )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                f'SELECT id, name, text FROM {TABLE} WHERE {where}',
+                recipe_ids or [],
+            )
+
+
+def delete_from_search_index(recipe_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe_id])
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, в порядке релевантности."""
+    if connection.vendor == 'postgresql':
+        tsquery = 'websearch_to_tsquery(%s, %s)'
+        params = [settings.SEARCH_CONFIG, query]
+        queryset = queryset.filter(
+            RawSQL(
+                f'{TABLE}.search_vector @@ {tsquery}',
+                params, output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'ts_rank({TABLE}.search_vector, {tsquery})',
+                params, output_field=FloatField(),
+            )
+        )
+    elif connection.vendor == 'sqlite':
+        match = ' '.join(
+            '"{}"*'.format(word.replace('"', '""')) for word in query.split()
+        )
+        if not match:
+            return queryset.none()
+        queryset = queryset.filter(
+            id__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [match],
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'(SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = {TABLE}.id)',
+                [match], output_field=FloatField(),
+            )
+        )
+    else:
+        return queryset.filter(name__icontains=query)
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
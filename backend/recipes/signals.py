@@ -0,0 +1,148 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from users.models import Subscribe, User
+
+from .models import (FavoriteRecipe, Ingredient, IngredientInRecipe, Recipe,
+                     ShoppingCart, Tag)
+from .search import delete_from_search_index, update_search_index
+from .utils import (backfill_feed, bump_catalog_version_on_commit,
+                    fan_out_recipes, invalidate_recipe_cache, prune_feed,
+                    record_recipe_changes, refresh_cart_totals,
+                    refresh_tag_masks)
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(**kwargs):
+    bump_catalog_version_on_commit('tags')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(**kwargs):
+    bump_catalog_version_on_commit('ingredients')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(instance, **kwargs):
+    invalidate_recipe_cache([instance.id])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    record_recipe_changes(
+        [instance.id if sender is Recipe else instance.recipe_id])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, **kwargs):
+    update_search_index([instance.id])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_search_deleted(instance, **kwargs):
+    delete_from_search_index(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1)
+        fan_out_recipes([instance])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    User.objects.filter(
+        pk=instance.author_id, recipes_count__gt=0
+    ).update(recipes_count=F('recipes_count') - 1)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+def favorite_created(instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=F('favorites_count') + 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+def favorite_deleted(instance, **kwargs):
+    Recipe.objects.filter(
+        pk=instance.recipe_id, favorites_count__gt=0
+    ).update(favorites_count=F('favorites_count') - 1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def cart_changed(instance, **kwargs):
+    # Пересчитываем корзину пользователя целиком: при каскадном удалении
+    # ингредиенты рецепта могут быть уже удалены.
+    refresh_cart_totals([instance.user_id])
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def recipe_ingredient_saved(instance, **kwargs):
+    # Ингредиент строки мог смениться, поэтому пересчитываются
+    # корзины целиком.
+    refresh_cart_totals(ShoppingCart.objects.filter(
+        recipe_id=instance.recipe_id).values_list('user_id', flat=True))
+
+
+@receiver(post_delete, sender=IngredientInRecipe)
+def recipe_ingredient_deleted(instance, **kwargs):
+    refresh_cart_totals(
+        ShoppingCart.objects.filter(
+            recipe_id=instance.recipe_id).values_list('user_id', flat=True),
+        [instance.ingredient_id],
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(instance, action, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, Recipe):
+        recipe_ids = [instance.id]
+    elif pk_set:
+        recipe_ids = list(pk_set)
+    else:
+        refresh_tag_masks()
+        return
+    invalidate_recipe_cache(recipe_ids)
+    refresh_tag_masks(recipe_ids)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(instance, **kwargs):
+    if instance.bit is not None:
+        bit = 1 << instance.bit
+        Recipe.objects.annotate(
+            tag_bit=F('tags_mask').bitand(bit)
+        ).filter(tag_bit=bit).update(tags_mask=F('tags_mask') - bit)
+
+
+@receiver(post_save, sender=User)
+def author_changed(instance, created, update_fields, **kwargs):
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    invalidate_recipe_cache(
+        instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Subscribe)
+def subscribe_created(instance, created, **kwargs):
+    if created:
+        backfill_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscribe_deleted(instance, **kwargs):
+    prune_feed(instance.user_id, instance.author_id)
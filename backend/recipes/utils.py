@@ -0,0 +1,336 @@
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from users.models import Subscribe, User
+
+from .models import (FavoriteRecipe, FeedItem, Recipe, ShoppingCart,
+                     ShoppingCartIngredient, Tag)
+
+
+def count_subquery(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def get_counters():
+    """Хранимые счётчики: модель, поле, считаемые строки и их связь."""
+    return (
+        (Recipe, 'favorites_count', FavoriteRecipe.objects.all(), 'recipe'),
+        (User, 'recipes_count', Recipe.objects.all(), 'author'),
+        (User, 'followers_count', Subscribe.objects.all(), 'author'),
+        (User, 'following_count', Subscribe.objects.all(), 'user'),
+    )
+
+
+def repair_counter(model, counter, queryset, field):
+    """Исправляет расходящиеся значения счётчика; возвращает их число."""
+    actual = count_subquery(queryset, field)
+    broken = model.objects.annotate(actual=actual).filter(
+        ~Q(**{counter: F('actual')}))
+    return model.objects.filter(
+        pk__in=broken.values('pk')).update(**{counter: actual})
+
+
+@transaction.atomic
+def backfill_counters(**kwargs):
+    """Заполняет счётчики, которые ещё ни разу не считались.
+
+    Вызывается после migrate: новые колонки создаются с нулями,
+    и без пересчёта карточки показывали бы 0 до repair_counters.
+    """
+    for model, counter, queryset, field in get_counters():
+        if (queryset.exists() and not model.objects.filter(
+                **{f'{counter}__gt': 0}).exists()):
+            repair_counter(model, counter, queryset, field)
+
+
+def refresh_favorites_count(recipe_ids):
+    """Пересчитывает favorites_count рецептов по таблице избранного."""
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        favorites_count=count_subquery(FavoriteRecipe.objects.all(), 'recipe'))
+
+
+def get_cart_totals(user_ids=None, ingredient_ids=None):
+    """Суммы ингредиентов в корзинах, посчитанные по живым данным."""
+    filters = {}
+    if user_ids is not None:
+        filters['user_id__in'] = user_ids
+    if ingredient_ids is not None:
+        filters['recipe__recipe__ingredient_id__in'] = ingredient_ids
+    return ShoppingCart.objects.filter(**filters).values(
+        'user_id',
+        ingredient_id=F('recipe__recipe__ingredient_id'),
+    ).annotate(
+        total_amount=Sum('recipe__recipe__amount')
+    ).order_by()
+
+
+@transaction.atomic
+def refresh_cart_totals(user_ids=None, ingredient_ids=None):
+    """Пересчитывает суммы в списках покупок для указанных пар.
+
+    Затрагиваются только строки заданных пользователей и ингредиентов;
+    None означает «все».
+    """
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+    if ingredient_ids is not None:
+        ingredient_ids = list(ingredient_ids)
+        if not ingredient_ids:
+            return
+    totals = ShoppingCartIngredient.objects.all()
+    if user_ids is not None:
+        totals = totals.filter(user_id__in=user_ids)
+    if ingredient_ids is not None:
+        totals = totals.filter(ingredient_id__in=ingredient_ids)
+    totals.delete()
+    ShoppingCartIngredient.objects.bulk_create(
+        ShoppingCartIngredient(**row)
+        for row in get_cart_totals(user_ids, ingredient_ids)
+        if row['ingredient_id'] is not None
+    )
+
+
+def backfill_cart_totals(**kwargs):
+    """Заполняет пустую таблицу сумм по существующим корзинам.
+
+    Вызывается после migrate, чтобы после появления таблицы выгрузка
+    списка покупок работала без ручного rebuild_cart_totals.
+    """
+    if (ShoppingCart.objects.exists()
+            and not ShoppingCartIngredient.objects.exists()):
+        refresh_cart_totals()
+
+
+def get_catalog_version_key(catalog):
+    return f'catalog:{catalog}:version'
+
+
+def get_catalog_version(catalog):
+    """Текущая версия справочника (tags, ingredients или recipes)."""
+    key = get_catalog_version_key(catalog)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_catalog_version_on_commit(catalog):
+    transaction.on_commit(lambda: bump_catalog_version(catalog))
+
+
+def bump_catalog_version(catalog):
+    """Увеличивает версию справочника после любого изменения."""
+    key = get_catalog_version_key(catalog)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+        return cache.get(key)
+
+
+def get_recipe_changes_key(version):
+    return f'catalog:recipes:changes:{version}'
+
+
+def record_recipe_changes(recipe_ids):
+    """После фиксации увеличивает версию рецептов и запоминает,
+    какие рецепты изменились в этой версии.
+    """
+    recipe_ids = list(recipe_ids)
+
+    def record():
+        version = bump_catalog_version('recipes')
+        cache.set(get_recipe_changes_key(version), recipe_ids,
+                  settings.CATALOG_CACHE_TIMEOUT)
+
+    transaction.on_commit(record)
+
+
+def get_recipe_changes(since, until):
+    """Рецепты, изменённые между версиями, или None, если журнал неполон."""
+    if not 0 < until - since <= settings.RECIPE_CHANGES_LIMIT:
+        return None
+    keys = [get_recipe_changes_key(version)
+            for version in range(since + 1, until + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return None
+    return set().union(*changes.values())
+
+
+def get_recipe_cache_key(recipe_id):
+    """Ключ кеша общей для всех пользователей части рецепта.
+
+    В ключ входят версии справочников, поэтому правка тегов
+    и ингредиентов не оставляет в кеше устаревших рецептов.
+    """
+    return (
+        f'recipe:{recipe_id}:{get_catalog_version("tags")}:'
+        f'{get_catalog_version("ingredients")}'
+    )
+
+
+def invalidate_recipe_cache(recipe_ids):
+    """Удаляет рецепты из кеша после фиксации транзакции."""
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: cache.delete_many(
+        [get_recipe_cache_key(recipe_id) for recipe_id in recipe_ids]))
+
+
+def get_fan_in_author_ids(author_ids):
+    """Авторы, чьи рецепты не раскладываются по лентам подписчиков.
+
+    У авторов с огромным числом подписчиков рецепты подмешиваются
+    в ленту при чтении, а не копируются каждому подписчику.
+    """
+    return set(User.objects.filter(
+        id__in=author_ids,
+        followers_count__gte=settings.FEED_FANOUT_LIMIT,
+    ).values_list('id', flat=True))
+
+
+def fan_out_recipes(recipes):
+    """Добавляет новые рецепты в ленты подписчиков их авторов."""
+    authors = {recipe.author_id for recipe in recipes}
+    authors -= get_fan_in_author_ids(authors)
+    followers = {}
+    for author_id, user_id in Subscribe.objects.filter(
+        author_id__in=authors
+    ).values_list('author_id', 'user_id'):
+        followers.setdefault(author_id, []).append(user_id)
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(
+                user_id=user_id,
+                recipe_id=recipe.id,
+                author_id=recipe.author_id,
+                pub_date=recipe.pub_date,
+            )
+            for recipe in recipes
+            for user_id in followers.get(recipe.author_id, ())
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_feed(user_id, author_id):
+    """Добавляет в ленту рецепты автора после подписки на него."""
+    if get_fan_in_author_ids([author_id]):
+        return
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for recipe_id, pub_date in Recipe.objects.filter(
+                author_id=author_id).values_list('id', 'pub_date')
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def rebuild_feeds():
+    """Пересобирает ленты всех подписчиков по подпискам."""
+    FeedItem.objects.all().delete()
+    subscriptions = Subscribe.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in subscriptions.iterator():
+        backfill_feed(user_id, author_id)
+
+
+@transaction.atomic
+def backfill_feeds(**kwargs):
+    """Заполняет пустые ленты по существующим подпискам.
+
+    Вызывается после migrate, чтобы после появления таблицы лент
+    подписчики не получали пустую ленту до rebuild_feed.
+    """
+    if Subscribe.objects.exists() and not FeedItem.objects.exists():
+        rebuild_feeds()
+
+
+def prune_feed(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки."""
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def get_feed(user):
+    """Лента подписок: строки recipe_id и pub_date, новые сверху."""
+    fan_in = get_fan_in_author_ids(
+        Subscribe.objects.filter(user=user).values('author_id'))
+    feed = FeedItem.objects.filter(user=user).exclude(
+        author_id__in=fan_in).values('recipe_id', 'pub_date')
+    if fan_in:
+        feed = feed.order_by().union(
+            Recipe.objects.filter(author_id__in=fan_in).order_by().values(
+                'id', 'pub_date'),
+            all=True,
+        )
+    return feed.order_by('-pub_date', '-recipe_id')
+
+
+def get_tag_bits():
+    """Словарь slug -> бит тега, закешированный по версии тегов."""
+    key = f'tag_bits:{get_catalog_version("tags")}'
+    bits = cache.get(key)
+    if bits is None:
+        # Из основной базы: реплика может отставать от смены версии.
+        bits = dict(Tag.objects.using(DEFAULT_DB_ALIAS).exclude(
+            bit=None).values_list('slug', 'bit'))
+        cache.set(key, bits, settings.CATALOG_CACHE_TIMEOUT)
+    return bits
+
+
+def assign_missing_tag_bits():
+    """Назначает биты тегам, у которых их ещё нет; возвращает эти теги."""
+    tags = list(Tag.objects.filter(bit=None))
+    Tag.assign_bits(tags)
+    Tag.objects.bulk_update(tags, ['bit'])
+    return tags
+
+
+@transaction.atomic
+def backfill_tag_masks(**kwargs):
+    """Назначает биты существующим тегам и пересчитывает маски.
+
+    Вызывается после migrate: без битов фильтр ?tags= не принимает
+    теги, созданные до появления масок.
+    """
+    if assign_missing_tag_bits():
+        refresh_tag_masks()
+        bump_catalog_version_on_commit('tags')
+
+
+def refresh_tag_masks(recipe_ids=None):
+    """Пересчитывает Recipe.tags_mask по связям рецептов с тегами."""
+    links = Recipe.tags.through.objects.exclude(tag__bit=None)
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        links = links.filter(recipe_id__in=recipe_ids)
+        recipes = recipes.filter(id__in=recipe_ids)
+    masks = defaultdict(int)
+    for recipe_id, bit in links.values_list('recipe_id', 'tag__bit'):
+        masks[recipe_id] |= 1 << bit
+    by_mask = defaultdict(list)
+    for recipe_id, mask in masks.items():
+        by_mask[mask].append(recipe_id)
+    for mask, ids in by_mask.items():
+        Recipe.objects.filter(id__in=ids).update(tags_mask=mask)
+    recipes.exclude(id__in=list(masks)).exclude(tags_mask=0).update(
+        tags_mask=0)
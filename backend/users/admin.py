@@ -1,6 +1,5 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from django.db.models import Count
 
 from .models import Subscribe, User
 
@@ -20,18 +19,12 @@ class UserAdmin(UserAdmin):
     list_filter = ('first_name', 'email')
     empty_value_display = '-пусто-'
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.annotate(recipe_count=Count('recipes'))
-        queryset = queryset.annotate(follower_count=Count('follower'))
-        return queryset
-
     def get_recipe_count(self, obj):
-        return obj.recipe_count
+        return obj.recipes_count
     get_recipe_count.short_description = 'Кол-во рецептов'
 
     def get_follower_count(self, obj):
-        return obj.follower_count
+        return obj.followers_count
     get_follower_count.short_description = 'Кол-во подписчиков'
 
 
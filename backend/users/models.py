@@ -3,6 +3,8 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.db.models import CheckConstraint, F, Q, UniqueConstraint
 
+COUNTER_FIELDS = ('recipes_count', 'followers_count', 'following_count')
+
 
 class User(AbstractUser):
     username = models.CharField(
@@ -23,6 +25,21 @@ class User(AbstractUser):
         verbose_name='Фамилия',
         max_length=settings.MAX_LEN,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Количество подписок',
+        default=0,
+        editable=False,
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = [
@@ -39,6 +56,22 @@ class User(AbstractUser):
     def __str__(self):
         return f'{self.username}, {self.email}'
 
+    def save(self, *args, **kwargs):
+        # Счётчики меняются только атомарными UPDATE, поэтому обычное
+        # сохранение не должно перезаписывать их устаревшими значениями.
+        # Из переданного update_fields они тоже исключаются.
+        if not self._state.adding:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key
+                ]
+            kwargs['update_fields'] = [
+                name for name in update_fields if name not in COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Subscribe(models.Model):
     user = models.ForeignKey(
@@ -65,6 +98,10 @@ class Subscribe(models.Model):
             CheckConstraint(check=~Q(user=F('author')),
                             name='no_self_subscription'),
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='subscribe_author_user'),
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
@@ -0,0 +1,37 @@
+from api.authentication import invalidate_token, invalidate_user_tokens
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .models import Subscribe, User
+
+
+@receiver(post_save, sender=Subscribe)
+def subscribe_created(instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            followers_count=F('followers_count') + 1)
+        User.objects.filter(pk=instance.user_id).update(
+            following_count=F('following_count') + 1)
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscribe_deleted(instance, **kwargs):
+    User.objects.filter(
+        pk=instance.author_id, followers_count__gt=0
+    ).update(followers_count=F('followers_count') - 1)
+    User.objects.filter(
+        pk=instance.user_id, following_count__gt=0
+    ).update(following_count=F('following_count') - 1)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_changed(instance, created, **kwargs):
+    if not created:
+        invalidate_user_tokens(instance)
@@ -1,5 +1,7 @@
+from api.mixins import ReplicaReadMixin
 from api.pagination import CustomPagination
 from api.serializers import SubscribeSerializer, UserListSerializer
+from api.utils import get_recipes_by_author, get_recipes_limit
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import status
@@ -10,7 +12,7 @@ from rest_framework.response import Response
 from .models import Subscribe, User
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(ReplicaReadMixin, UserViewSet):
     """Действия с подписками."""
     queryset = User.objects.all()
     serializer_class = UserListSerializer
@@ -44,7 +46,12 @@ class CustomUserViewSet(UserViewSet):
         user = request.user
         queryset = User.objects.filter(following__user=user)
         pages = self.paginate_queryset(queryset)
+        recipes = get_recipes_by_author(
+            [author.id for author in pages],
+            get_recipes_limit(request),
+        )
         serializer = SubscribeSerializer(pages,
                                          many=True,
-                                         context={'request': request})
+                                         context={'request': request,
+                                                  'recipes': recipes})
         return self.get_paginated_response(serializer.data)